@@ -4,7 +4,6 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
-import numpy as np
 import matplotlib.pyplot as plt
 from game.world.world import World
 from game.world.player import Player
@@ -16,7 +15,7 @@ def visualize_world():
     
     # Create world
     world = World(150, 150, seed=42)
-    player = Player(75, 75)
+    player = Player(75, 75, casters=world.casters)
     
     # Simulate some magic usage
     player.start_evocation_push("heat", 90, 90)
@@ -65,18 +64,7 @@ def visualize_world():
     
     # Biome map
     ax4 = plt.subplot(2, 4, 4)
-    biome_map = np.zeros((world.height, world.width))
-    biome_colors = {
-        "mountain": 4,
-        "water": 1,
-        "desert": 3,
-        "tundra": 2,
-        "plains": 0
-    }
-    for y in range(world.height):
-        for x in range(world.width):
-            biome = world.get_biome(x, y)
-            biome_map[y, x] = biome_colors.get(biome, 0)
+    biome_map = world.biome_map()  # Indices into BIOMES: plains, water, tundra, desert, mountain
     
     im4 = ax4.imshow(biome_map, cmap='tab10', origin='lower')
     ax4.plot(player.x, player.y, 'yo', markersize=10, markeredgecolor='red', markeredgewidth=2)
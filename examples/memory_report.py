@@ -0,0 +1,77 @@
+"""Example: Report memory used per instance by the game's value types"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import gc
+import tracemalloc
+
+from game.core.energy import EnergyNode
+from game.magic.spells import Spell, Scroll
+from game.magic.stats import PlayerStats
+from game.magic.evocation import Evocation, EvocationEngine
+from game.world.player import Player
+
+
+# Instances created per measurement
+COUNT = 20000
+
+
+def bytes_per_instance(make, count=COUNT):
+    """
+    Measure the memory allocated per object by a factory
+    
+    Args:
+        make: Callable taking an index and returning a new object
+        count: Number of objects to create
+    
+    Returns:
+        Bytes allocated per object (including its slot in a list and
+        everything it allocates, such as engines and stats)
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [make(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return allocated / count
+
+
+def main():
+    """Print a per-type memory report"""
+    spell_data = [Spell(f"Spell {i}", "heat", "radius", 3, 10.0, 5.0).to_dict()
+                  for i in range(COUNT)]
+    spells = [Spell.from_dict(data) for data in spell_data]
+    # Every Evocation takes its stats into a pool, so each measurement gets fresh ones
+    stats = {name: [PlayerStats() for _ in range(COUNT)]
+             for name in ("idle", "evoking", "world")}
+    world_casters = EvocationEngine()
+    player_casters = EvocationEngine()
+    
+    def evoking(i):
+        evocation = Evocation(stats["evoking"][i])
+        evocation.start_push("heat", 10, 10)
+        return evocation
+    
+    factories = {
+        "Spell": lambda i: Spell.from_dict(spell_data[i]),
+        "Scroll": lambda i: Scroll(spells[i]),
+        "EnergyNode": lambda i: EnergyNode(),
+        "PlayerStats": lambda i: PlayerStats(),
+        "Evocation (standalone, idle)": lambda i: Evocation(stats["idle"][i]),
+        "Evocation (standalone, evoking)": evoking,
+        "Evocation (World.casters row)": lambda i: Evocation(stats["world"][i], world_casters),
+        "Player (standalone)": lambda i: Player(),
+        "Player (World.casters)": lambda i: Player(casters=player_casters),
+    }
+    print(f"Memory per instance ({COUNT} instances each, Python "
+          f"{sys.version_info.major}.{sys.version_info.minor})\n")
+    for name, make in factories.items():
+        print(f"{name:<32} {bytes_per_instance(make):>7.0f}B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Tile-level activity tracking for sparse field simulation"""
+import numpy as np
+
+
+def tile_grid(width, height, tile_size):
+    """Shape (rows, cols) of the tile grid covering a field"""
+    return -(-height // tile_size), -(-width // tile_size)
+
+
+def wake(awake, tile_size, x0=0, y0=0, x1=None, y1=None):
+    """
+    Mark every tile overlapping a rectangle as awake
+    
+    Args:
+        awake: Boolean (..., rows, cols) tile mask to modify
+        tile_size: Tile edge length in cells
+        x0, y0: Top-left corner (inclusive)
+        x1, y1: Bottom-right corner (exclusive); None means the edge
+    """
+    rows, cols = awake.shape[-2:]
+    tx0, ty0 = max(int(x0), 0) // tile_size, max(int(y0), 0) // tile_size
+    tx1 = cols if x1 is None else min(-(-int(x1) // tile_size), cols)
+    ty1 = rows if y1 is None else min(-(-int(y1) // tile_size), rows)
+    if tx0 < tx1 and ty0 < ty1:
+        awake[..., ty0:ty1, tx0:tx1] = True
+
+
+def active_tiles(awake):
+    """
+    Tiles that need simulating this tick
+    
+    Awake tiles in any channel, grown by one tile in every direction so
+    diffusion can spread into sleeping neighbours.
+    
+    Args:
+        awake: Boolean (..., rows, cols) tile mask
+    
+    Returns:
+        Boolean (rows, cols) mask
+    """
+    active = awake.reshape(-1, *awake.shape[-2:]).any(axis=0)
+    grown = active.copy()
+    grown[1:, :] |= active[:-1, :]
+    grown[:-1, :] |= active[1:, :]
+    grown[:, 1:] |= grown[:, :-1].copy()
+    grown[:, :-1] |= grown[:, 1:].copy()
+    return grown
+
+
+def tile_rects(active, tile_size, width, height):
+    """
+    Split an active tile mask into cell rectangles
+    
+    Each rectangle is a horizontal run of active tiles in one tile row.
+    
+    Args:
+        active: Boolean (rows, cols) tile mask
+        tile_size: Tile edge length in cells
+        width, height: Field size
+    
+    Returns:
+        List of (x0, y0, x1, y1) rectangles clipped to the field
+    """
+    rects = []
+    for row in np.flatnonzero(active.any(axis=1)):
+        # Run starts and ends from the edges of the padded row
+        edges = np.diff(np.concatenate(([0], active[row].astype(np.int8), [0])))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        y0, y1 = row * tile_size, min((row + 1) * tile_size, height)
+        for start, stop in zip(starts, stops):
+            rects.append((start * tile_size, y0, min(stop * tile_size, width), y1))
+    return rects
+
+
+def settle(data, awake, tile_size, rects, threshold):
+    """
+    Put quiet tiles to sleep
+    
+    Tiles inside `rects` whose largest |value| is at or below `threshold`
+    are zeroed and marked asleep; the rest are marked awake. Sleeping tiles
+    therefore always hold exact zeros.
+    
+    Args:
+        data: Field array (..., height, width), modified in place
+        awake: Boolean (..., rows, cols) tile mask to update
+        tile_size: Tile edge length in cells
+        rects: Tile-aligned rectangles, as returned by tile_rects
+        threshold: Largest |value| a sleeping tile may hold
+    """
+    for x0, y0, x1, y1 in rects:
+        region = data[..., y0:y1, x0:x1]
+        column_max = np.abs(region).max(axis=-2)
+        tile_max = np.maximum.reduceat(column_max, np.arange(0, x1 - x0, tile_size), axis=-1)
+        live = tile_max > threshold
+        awake[..., y0 // tile_size, x0 // tile_size:-(-x1 // tile_size)] = live
+        quiet = ~live & (tile_max != 0)
+        if quiet.any():
+            columns = np.repeat(quiet, tile_size, axis=-1)[..., :x1 - x0]
+            region[np.broadcast_to(columns[..., np.newaxis, :], region.shape)] = 0
@@ -0,0 +1,210 @@
+"""Chunked, lazily generated noise fields"""
+from collections import OrderedDict
+
+import numpy as np
+
+from game.core.mipmap import TiledMipPyramid
+from game.core.noise_field import NoiseField, ENGINES
+from game.core.sampling import sample
+
+
+class ChunkedNoiseField(NoiseField):
+    """
+    Noise field generated in fixed-size chunks on first access
+    
+    Chunks live in an LRU cache bounded by a memory budget. Evicted chunks
+    are regenerated from the seed when touched again, unless they were
+    modified, in which case they are written to `store` on eviction and
+    restored from it.
+    """
+    
+    def __init__(self, width=None, height=None, seed=0, scale=0.1, octaves=6,
+                 persistence=0.5, lacunarity=2.0, engine="numpy",
+                 chunk_size=64, max_bytes=64 * 1024 * 1024, store=None):
+        """
+        Initialize a chunked noise field
+        
+        Args:
+            width: Width of the field (None for unbounded)
+            height: Height of the field (None for unbounded)
+            seed: Random seed for reproducibility
+            scale: Scale of the noise (smaller = more detail)
+            octaves: Number of noise layers
+            persistence: How much each octave contributes
+            lacunarity: Frequency multiplier between octaves
+            engine: Noise backend, one of ENGINES
+            chunk_size: Side length of a chunk in cells
+            max_bytes: Memory budget for cached chunks
+            store: Mapping that receives modified chunks on eviction
+                (defaults to an in-memory dict)
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown noise engine: {engine}")
+        # NoiseField.__init__ would generate the whole grid, so the
+        # parameters are set up here instead
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.scale = scale
+        self.octaves = octaves
+        self.persistence = persistence
+        self.lacunarity = lacunarity
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.store = {} if store is None else store
+        
+        self._chunks = OrderedDict()  # (cx, cy) -> array, oldest first
+        self._dirty = set()  # Chunks that differ from the generated noise
+        self._chunk_bytes = chunk_size * chunk_size * np.dtype(np.float64).itemsize
+        self.change_listeners = []
+        self._mipmap = None
+    
+    @property
+    def data(self):
+        """Whole field as a dense array (bounded fields only)"""
+        if self.width is None or self.height is None:
+            raise ValueError("Unbounded field has no dense representation")
+        return self.get_region(0, 0, self.width, self.height)
+    
+    @property
+    def mipmap(self):
+        """
+        Level-of-detail pyramid over the field, built on first use
+        
+        Tiles line up with chunks and are built from the chunks a view
+        covers, so unbounded fields work too.
+        """
+        if self._mipmap is None:
+            self._mipmap = TiledMipPyramid(
+                lambda x0, y0, x1, y1: self.get_region(x0, y0, x1 - x0, y1 - y0),
+                self.width, self.height, tile_size=self.chunk_size
+            )
+        return self._mipmap
+    
+    def in_bounds(self, x, y):
+        """Check whether a position lies inside the field"""
+        if self.width is not None and not 0 <= x < self.width:
+            return False
+        if self.height is not None and not 0 <= y < self.height:
+            return False
+        return True
+    
+    def memory_usage(self):
+        """Bytes held by cached chunks"""
+        return len(self._chunks) * self._chunk_bytes
+    
+    def _chunk(self, cx, cy):
+        """Get a chunk, generating or restoring it if needed"""
+        key = (cx, cy)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+        
+        if key in self.store:
+            chunk = self.store.pop(key)
+            self._dirty.add(key)
+        else:
+            size = self.chunk_size
+            chunk = self._generate_region(cx * size, cy * size, size, size)
+        self._chunks[key] = chunk
+        self._evict()
+        return chunk
+    
+    def _evict(self):
+        """Drop least recently used chunks until within the memory budget"""
+        # Always keep the chunk that was just touched
+        while len(self._chunks) > 1 and self.memory_usage() > self.max_bytes:
+            key, chunk = self._chunks.popitem(last=False)
+            if key in self._dirty:
+                self.store[key] = chunk
+                self._dirty.discard(key)
+    
+    def flush(self):
+        """Write every modified cached chunk to the store"""
+        for key in self._dirty:
+            self.store[key] = self._chunks[key].copy()
+    
+    def get_value(self, x, y):
+        """Get the value at a specific position"""
+        if not self.in_bounds(x, y):
+            return 0.5
+        x, y = int(np.floor(x)), int(np.floor(y))
+        size = self.chunk_size
+        return self._chunk(x // size, y // size)[y % size, x % size]
+    
+    def set_value(self, x, y, value):
+        """Set the value at a specific position"""
+        if not self.in_bounds(x, y):
+            return
+        x, y = int(np.floor(x)), int(np.floor(y))
+        size = self.chunk_size
+        key = (x // size, y // size)
+        self._chunk(*key)[y % size, x % size] = np.clip(value, 0, 1)
+        self._dirty.add(key)
+        self.mark_dirty(x, y, x + 1, y + 1)
+    
+    def _gather(self, ix, iy):
+        """Read cells at 1D integer index arrays, touching each chunk once"""
+        size = self.chunk_size
+        values = np.empty(len(ix))
+        keys = np.stack([ix // size, iy // size], axis=1)
+        chunk_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for index, (cx, cy) in enumerate(chunk_keys):
+            mask = inverse == index
+            chunk = self._chunk(int(cx), int(cy))
+            values[mask] = chunk[iy[mask] % size, ix[mask] % size]
+        return values
+    
+    def sample(self, xs, ys, mode="nearest"):
+        """
+        Get values at many positions at once
+        
+        Args:
+            xs, ys: Position arrays
+            mode: "nearest" (same as get_value) or "bilinear"
+        
+        Returns:
+            Array of values; out-of-bounds positions read as 0.5
+        """
+        return sample(self._gather, self.width, self.height, xs, ys, mode, default=0.5)
+    
+    def get_region(self, x0, y0, width, height):
+        """
+        Read a rectangular block of the field
+        
+        Args:
+            x0, y0: Top-left corner of the region
+            width, height: Region size
+        
+        Returns:
+            float64 array of shape (height, width); cells outside a bounded
+            field read as neutral 0.5
+        """
+        result = np.full((height, width), 0.5)
+        # Clip the request to the field bounds
+        left, top = x0, y0
+        right, bottom = x0 + width, y0 + height
+        if self.width is not None:
+            left, right = max(left, 0), min(right, self.width)
+        if self.height is not None:
+            top, bottom = max(top, 0), min(bottom, self.height)
+        if left >= right or top >= bottom:
+            return result
+        
+        size = self.chunk_size
+        for cy in range(top // size, (bottom - 1) // size + 1):
+            for cx in range(left // size, (right - 1) // size + 1):
+                chunk = self._chunk(cx, cy)
+                # Overlap of this chunk with the clipped request
+                sx0 = max(left, cx * size)
+                sx1 = min(right, (cx + 1) * size)
+                sy0 = max(top, cy * size)
+                sy1 = min(bottom, (cy + 1) * size)
+                result[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = chunk[
+                    sy0 - cy * size:sy1 - cy * size,
+                    sx0 - cx * size:sx1 - cx * size
+                ]
+        return result
@@ -0,0 +1,218 @@
+"""Domain-decomposed multi-process energy simulation"""
+import math
+import multiprocessing
+import threading
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from game.core.activity import tile_grid, tile_rects, settle
+from game.core.energy import (EnergyStack, DIFFUSION_BLEND, SPECTRAL_STEPS, _diffuse,
+                              _retention, _steps, _substeps)
+
+
+# Control block layout: [command, number of equal steps, their length,
+# final fraction of a step, retention per channel for an equal step...,
+# for the fraction...]
+_STOP, _STEP = 0, 1
+
+# Seconds the coordinator waits at a barrier before giving up on the workers
+BARRIER_TIMEOUT = 60
+
+
+def _strip_worker(names, shape, tile_size, threshold, y0, y1, start, halo, done):
+    """
+    Worker: simulate rows y0:y1 of every channel, tick after tick
+    
+    A tick is a number of equal steps (in reference steps) plus an
+    optional final fraction of one. Each step copies the owned rows plus a one-row halo from each
+    neighbouring strip out of shared memory, waits until every worker has
+    its halos, steps the private copy with the same kernel as EnergyStack,
+    writes the owned rows back, settles them and waits again before the
+    next step.
+    
+    Args:
+        names: Shared memory names (data, awake, control)
+        shape: (channels, height, width) of the energy data
+        tile_size: Tile edge length in cells (strips are tile-aligned)
+        threshold: Sleep threshold for settling owned tiles
+        y0, y1: Owned rows
+        start, done: Barriers shared with the coordinator
+        halo: Barrier shared by the workers only
+    """
+    channels, height, width = shape
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        data = np.ndarray(shape, dtype=np.float32, buffer=blocks[0].buf)
+        awake = np.ndarray((channels,) + tile_grid(width, height, tile_size),
+                           dtype=bool, buffer=blocks[1].buf)
+        control = np.ndarray((4 + 2 * channels,), dtype=np.float64, buffer=blocks[2].buf)
+        
+        # Local rows: owned rows plus halos where a neighbour strip exists
+        ly0, ly1 = max(y0 - 1, 0), min(y1 + 1, height)
+        local = np.empty((channels, ly1 - ly0, width), dtype=np.float32)
+        scratch = np.empty((channels, max(ly1 - ly0 - 2, 0), max(width - 2, 0)),
+                           dtype=np.float32)
+        owned = data[:, y0:y1]
+        rows, cols = -(-(y1 - y0) // tile_size), awake.shape[-1]
+        rects = tile_rects(np.ones((rows, cols), dtype=bool), tile_size, width, y1 - y0)
+        owned_awake = awake[:, y0 // tile_size:y0 // tile_size + rows]
+        
+        while True:
+            start.wait()
+            if control[0] == _STOP:
+                break
+            count, length, fraction = int(control[1]), float(control[2]), float(control[3])
+            retention = control[4:].astype(np.float32).reshape(2, channels, 1, 1)
+            schedule = [(retention[0], length)] * count
+            if fraction > 0:
+                schedule.append((retention[1], fraction))
+            for step_retention, step in schedule:
+                np.copyto(local, data[:, ly0:ly1])
+                halo.wait()
+                local *= step_retention
+                # Python float blend, so the math stays float32 as in EnergyStack
+                _diffuse(local, scratch, DIFFUSION_BLEND * step)
+                owned[...] = local[:, y0 - ly0:y1 - ly0]
+                settle(owned, owned_awake, tile_size, rects, threshold)
+                halo.wait()
+            done.wait()
+        del data, awake, control, owned, owned_awake  # Release the buffers before closing
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def _strips(height, tile_size, workers):
+    """Split the rows into up to `workers` tile-aligned (y0, y1) strips"""
+    tile_rows = -(-height // tile_size)
+    workers = max(1, min(workers, tile_rows))
+    bounds = [round(i * tile_rows / workers) * tile_size for i in range(workers + 1)]
+    return [(y0, min(y1, height)) for y0, y1 in zip(bounds, bounds[1:])]
+
+
+def _shutdown(start, processes, blocks):
+    """Stop the workers and free the shared memory"""
+    control = np.ndarray((1,), dtype=np.float64, buffer=blocks[2].buf)
+    control[0] = _STOP
+    del control
+    try:
+        start.wait(timeout=BARRIER_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+    for process in processes:
+        process.join(timeout=BARRIER_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass  # Views still alive elsewhere; the mapping goes with them
+        block.unlink()
+
+
+class DistributedEnergyStack(EnergyStack):
+    """
+    EnergyStack whose decay and diffusion run on worker processes
+    
+    The energy data and tile masks live in shared memory and the map is
+    split into horizontal strips (aligned to whole tile rows), each owned
+    by one long-lived worker. Rows on strip edges are exchanged as one-cell
+    halos every diffusion step, and the coordinator waits on a barrier
+    until every strip has finished the tick. Between ticks the workers are
+    idle, so adding energy, reactions and sampling work on the shared
+    arrays in this process exactly as with an EnergyStack.
+    
+    Every tile is stepped and settled each step, which gives bit-identical
+    results to EnergyStack.update for steps up to SPECTRAL_STEPS
+    reference steps, split into the same substeps. Longer steps run as
+    whole reference steps plus a final fraction of one rather than one
+    spectral solve; for whole multiples of REFERENCE_DT they match
+    EnergyStack.update to floating-point tolerance.
+    """
+    
+    def __init__(self, width, height, decay_rates, workers=2, tile_size=32,
+                 sleep_threshold=1e-4):
+        """
+        Initialize the stack and start its workers
+        
+        Args:
+            width: Field width
+            height: Field height
+            decay_rates: Dict of energy type -> decay rate (channel order)
+            workers: Number of worker processes (one strip each)
+            tile_size: Edge length of the tiles used for activity tracking
+            sleep_threshold: Largest |energy| a sleeping tile may hold
+        """
+        channels = len(decay_rates)
+        shape = (channels, height, width)
+        awake_shape = (channels,) + tile_grid(width, height, tile_size)
+        sizes = [int(np.prod(shape)) * 4, int(np.prod(awake_shape)), (4 + 2 * channels) * 8]
+        self._blocks = [shared_memory.SharedMemory(create=True, size=max(size, 1))
+                        for size in sizes]
+        data = np.ndarray(shape, dtype=np.float32, buffer=self._blocks[0].buf)
+        awake = np.ndarray(awake_shape, dtype=bool, buffer=self._blocks[1].buf)
+        data.fill(0)
+        awake.fill(False)
+        self._control = np.ndarray((4 + 2 * channels,), dtype=np.float64,
+                                   buffer=self._blocks[2].buf)
+        super().__init__(width, height, decay_rates, tile_size, sleep_threshold,
+                         data=data, awake=awake)
+        self._scratch = None  # Workers keep their own buffers
+        
+        self.strips = _strips(height, tile_size, workers)
+        count = len(self.strips)
+        self._start = multiprocessing.Barrier(count + 1)
+        self._done = multiprocessing.Barrier(count + 1)
+        halo = multiprocessing.Barrier(count)
+        names = [block.name for block in self._blocks]
+        self._processes = [
+            multiprocessing.Process(
+                target=_strip_worker, daemon=True,
+                args=(names, shape, tile_size, sleep_threshold, y0, y1,
+                      self._start, halo, self._done))
+            for y0, y1 in self.strips
+        ]
+        for process in self._processes:
+            process.start()
+        self._finalizer = weakref.finalize(self, _shutdown, self._start, self._processes,
+                                           self._blocks)
+    
+    def update(self, dt=None):
+        """
+        Advance every strip by one tick and wait for all of them
+        
+        Args:
+            dt: Time step in seconds (None = one reference step)
+        """
+        if not self._finalizer.alive:
+            raise RuntimeError("DistributedEnergyStack has been closed")
+        steps = _steps(dt)
+        if steps == 0:
+            return
+        if steps <= SPECTRAL_STEPS:
+            substeps = _substeps(steps)
+            count, length, fraction = len(substeps), substeps[0], 0
+        else:
+            count, length = math.floor(steps), 1
+            fraction = steps - count
+        channels = len(self.types)
+        self._control[0] = _STEP
+        self._control[1:4] = count, length, fraction
+        self._control[4:4 + channels] = [_retention(rate, length) for rate in self.decay_rates]
+        self._control[4 + channels:] = [_retention(rate, fraction) for rate in self.decay_rates]
+        self._start.wait(timeout=BARRIER_TIMEOUT)
+        self._done.wait(timeout=BARRIER_TIMEOUT)
+        for field in self.fields.values():
+            field._notify()
+    
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        # Drop the views into shared memory first
+        self.data = self.awake = None
+        for field in self.fields.values():
+            field.data = field.awake = None
+        self._control = None
+        self._finalizer()
@@ -1,10 +1,249 @@
 """Energy system for world mechanics"""
+import math
+
 import numpy as np
 
+from game.core.activity import tile_grid, wake, active_tiles, tile_rects, settle
+from game.core.mipmap import MipPyramid
+from game.core.reactions import react
+from game.core.sampling import sample_array
+from game.core.stamp import stamp_add, stamp_kernel, stamp_add_many
+
+
+# Time step that one classic update() represents: decay_rate and the 0.2
+# diffusion blend are per REFERENCE_DT seconds
+REFERENCE_DT = 0.1
+
+# Neighbour blend of one reference diffusion step
+DIFFUSION_BLEND = 0.2
+
+# Steps up to this many reference steps run as explicit stencil substeps
+# of at most one reference step each; longer ones are solved spectrally.
+# A single stencil step this long would have blend 1, the stability limit.
+SPECTRAL_STEPS = 1 / DIFFUSION_BLEND
+
+
+def _retention(decay_rate, steps):
+    """
+    Fraction of energy left after `steps` reference steps of decay
+    
+    Exact exponential decay, equal to (1 - decay_rate) ** steps; one step
+    uses the same float32 factor as the classic update.
+    """
+    if steps == 1:
+        return np.float32(1 - decay_rate)
+    return np.float32(np.exp(steps * np.log1p(-decay_rate)))
+
+
+def _dst(data, axis):
+    """Type-I discrete sine transform along one axis (unnormalized)"""
+    n = data.shape[axis]
+    zero = np.zeros_like(np.take(data, [0], axis=axis))
+    odd = np.concatenate([zero, data, zero, -np.flip(data, axis=axis)], axis=axis)
+    spectrum = np.fft.rfft(odd, axis=axis)
+    return -np.take(spectrum, np.arange(1, n + 1), axis=axis).imag / 2
+
+
+def _diffuse_spectral(data, steps):
+    """
+    Advance diffusion by `steps` reference steps in one solve, in place
+    
+    The classic stencil is diagonal in the sine basis of the interior, with
+    gain g = 1 + BLEND/4 * (2cos(a) + 2cos(b) - 4) in [0.6, 1) per mode, so
+    raising g to any non-negative power gives an exact, unconditionally
+    stable large step at O(n log n) cost. The border ring never diffuses,
+    so for the interior it is a constant source, whose total over n steps
+    is the geometric sum (1 - g^n) / (1 - g) per mode. Call this after
+    decaying the whole step, as the stencil does.
+    
+    Args:
+        data: float32 array (..., height, width)
+        steps: Number of reference steps (any non-negative real)
+    """
+    interior = data[..., 1:-1, 1:-1]
+    rows, cols = interior.shape[-2:]
+    if rows == 0 or cols == 0:
+        return
+    row_modes = 2 * np.cos(np.pi * np.arange(1, rows + 1) / (rows + 1)) - 2
+    col_modes = 2 * np.cos(np.pi * np.arange(1, cols + 1) / (cols + 1)) - 2
+    coupling = DIFFUSION_BLEND / 4
+    gain = 1 + coupling * (row_modes[:, np.newaxis] + col_modes[np.newaxis, :])
+    
+    # What the border ring feeds into the adjacent interior cells per step
+    source = np.zeros(interior.shape)
+    source[..., 0, :] += data[..., 0, 1:-1]
+    source[..., -1, :] += data[..., -1, 1:-1]
+    source[..., :, 0] += data[..., 1:-1, 0]
+    source[..., :, -1] += data[..., 1:-1, -1]
+    source *= coupling
+    
+    growth = gain ** steps
+    spectrum = _dst(_dst(interior.astype(np.float64), -1), -2) * growth
+    spectrum += _dst(_dst(source, -1), -2) * ((1 - growth) / (1 - gain))
+    # DST-I is its own inverse up to a factor of 2 / (n + 1) per axis
+    result = _dst(_dst(spectrum, -1), -2) * (4 / ((rows + 1) * (cols + 1)))
+    interior[...] = result
+
+
+def _diffuse(data, neighbors, blend=DIFFUSION_BLEND):
+    """
+    One diffusion step over the last two axes of `data`, in place
+    
+    Each interior cell is blended with the mean of its 4 neighbours
+    (0.8 self, 0.2 neighbours by default); border cells are left alone.
+    The neighbour mean is fully computed in the scratch buffer before the
+    interior is overwritten, so every cell sees pre-diffusion values.
+    
+    Args:
+        data: float32 array (..., height, width)
+        neighbors: Scratch buffer shaped like data[..., 1:-1, 1:-1]
+        blend: Weight of the neighbour mean
+    """
+    interior = data[..., 1:-1, 1:-1]
+    np.add(data[..., :-2, 1:-1], data[..., 2:, 1:-1], out=neighbors)
+    np.add(neighbors, data[..., 1:-1, :-2], out=neighbors)
+    np.add(neighbors, data[..., 1:-1, 2:], out=neighbors)
+    neighbors /= 4
+    neighbors *= blend
+    # Blend current with neighbors (simple diffusion)
+    interior *= (1 - blend)
+    interior += neighbors
+
+
+def _diffuse_rects(data, rects, blend=DIFFUSION_BLEND):
+    """
+    Diffusion step (as _diffuse) restricted to a set of rectangles
+    
+    Cells outside the rectangles are read but not written. All new values
+    are computed before any are stored, so rectangles may share edges.
+    
+    Args:
+        data: float32 array (..., height, width)
+        rects: List of (x0, y0, x1, y1) rectangles
+        blend: Weight of the neighbour mean
+    """
+    height, width = data.shape[-2:]
+    updates = []
+    for x0, y0, x1, y1 in rects:
+        # Border cells of the field never diffuse
+        x0, y0 = max(x0, 1), max(y0, 1)
+        x1, y1 = min(x1, width - 1), min(y1, height - 1)
+        if x0 >= x1 or y0 >= y1:
+            continue
+        neighbors = data[..., y0 - 1:y1 - 1, x0:x1] + data[..., y0 + 1:y1 + 1, x0:x1]
+        neighbors += data[..., y0:y1, x0 - 1:x1 - 1]
+        neighbors += data[..., y0:y1, x0 + 1:x1 + 1]
+        neighbors /= 4
+        neighbors *= blend
+        blended = data[..., y0:y1, x0:x1] * (1 - blend)
+        blended += neighbors
+        updates.append((y0, y1, x0, x1, blended))
+    for y0, y1, x0, x1, blended in updates:
+        data[..., y0:y1, x0:x1] = blended
+
+
+def _substeps(steps):
+    """
+    Split a step into the steps actually simulated
+    
+    Up to one reference step is a single stencil step. Up to
+    SPECTRAL_STEPS, the step is split into equal stencil substeps of at
+    most one reference step, so whole multiples of REFERENCE_DT repeat
+    the classic update exactly. Anything longer is one spectral step.
+    
+    Args:
+        steps: Length of the step in reference steps
+    
+    Returns:
+        List of substep lengths in reference steps
+    """
+    if steps == 0:
+        return []
+    if steps <= 1 or steps > SPECTRAL_STEPS:
+        return [steps]
+    count = math.ceil(steps)
+    return [steps / count] * count
+
+
+def _simulate(data, decay_rate, scratch, awake, tile_size, threshold, steps=1):
+    """
+    Decay and diffuse only the awake tiles of a field, then settle them
+    
+    Sleeping tiles hold zeros, so leaving them alone gives the same
+    result as a full update until diffusion reaches them; awake tiles are
+    simulated together with a one-tile halo for exactly that reason.
+    Steps longer than one reference step run as stencil substeps (see
+    _substeps); steps longer than SPECTRAL_STEPS are solved spectrally
+    over the whole field instead, since energy may then travel
+    arbitrarily far.
+    
+    Args:
+        data: float32 array (..., height, width), modified in place
+        decay_rate: Decay per reference step (broadcast against data)
+        scratch: Diffusion buffer shaped like data[..., 1:-1, 1:-1]
+        awake: Boolean (..., rows, cols) tile mask, updated in place
+        tile_size: Tile edge length in cells
+        threshold: Largest |energy| a sleeping tile may hold
+        steps: Length of the step in reference steps
+    
+    Returns:
+        Bounding (x0, y0, x1, y1) of the simulated cells, or None if
+        nothing was simulated
+    """
+    changed = None
+    for step in _substeps(steps):
+        rect = _simulate_step(data, _retention(decay_rate, step), scratch, awake,
+                              tile_size, threshold, step)
+        if rect is None:
+            continue
+        if changed is None:
+            changed = rect
+        else:
+            changed = (min(changed[0], rect[0]), min(changed[1], rect[1]),
+                       max(changed[2], rect[2]), max(changed[3], rect[3]))
+    return changed
+
+
+def _simulate_step(data, retention, scratch, awake, tile_size, threshold, steps):
+    """One step of _simulate, with the decay already turned into a retention factor"""
+    height, width = data.shape[-2:]
+    active = active_tiles(awake)
+    if not active.any():
+        return None
+    if steps > SPECTRAL_STEPS:
+        active[...] = True
+    rects = tile_rects(active, tile_size, width, height)
+    if steps > SPECTRAL_STEPS:
+        data *= retention
+        _diffuse_spectral(data, steps)
+    elif active.all():
+        data *= retention
+        _diffuse(data, scratch, DIFFUSION_BLEND * steps)
+    else:
+        for x0, y0, x1, y1 in rects:
+            data[..., y0:y1, x0:x1] *= retention
+        _diffuse_rects(data, rects, DIFFUSION_BLEND * steps)
+    settle(data, awake, tile_size, rects, threshold)
+    return (min(r[0] for r in rects), min(r[1] for r in rects),
+            max(r[2] for r in rects), max(r[3] for r in rects))
+
+
+def _steps(dt):
+    """Convert a time step in seconds to reference steps"""
+    if dt is None:
+        return 1
+    if dt < 0:
+        raise ValueError(f"dt must be non-negative, got {dt}")
+    if dt == REFERENCE_DT:
+        return 1
+    return dt / REFERENCE_DT
+
 
 class EnergyNode:
     """Represents an object or area that can store and transfer energy"""
     
+    __slots__ = ("capacity", "current", "flow_rate", "connections")
+    
     def __init__(self, capacity=100, current=0, flow_rate=1.0):
         """
         Initialize an energy node
@@ -51,7 +290,8 @@ class EnergyNode:
 class EnergyField:
     """Energy field overlay for spatial energy distribution"""
     
-    def __init__(self, width, height, energy_type="heat", decay_rate=0.02):
+    def __init__(self, width, height, energy_type="heat", decay_rate=0.02, data=None,
+                 tile_size=32, sleep_threshold=1e-4, awake=None):
         """
         Initialize an energy field
         
@@ -60,49 +300,232 @@ class EnergyField:
             height: Field height
             energy_type: Type of energy (heat, cold, magic, etc.)
             decay_rate: Energy dissipation rate
+            data: Existing float32 (height, width) array to use as storage,
+                e.g. a channel of an EnergyStack
+            tile_size: Edge length of the tiles used for activity tracking
+            sleep_threshold: Tiles whose largest |energy| is at or below
+                this are zeroed and no longer simulated (0 = only empty tiles)
+            awake: Existing boolean tile mask to use, e.g. from an EnergyStack
         """
         self.width = width
         self.height = height
         self.energy_type = energy_type
         self.decay_rate = decay_rate
-        self.data = np.zeros((height, width), dtype=np.float32)
+        self.tile_size = tile_size
+        self.sleep_threshold = sleep_threshold
+        if awake is None:
+            awake = np.zeros(tile_grid(width, height, tile_size), dtype=bool)
+            if data is not None:
+                awake[...] = True
+        self.awake = awake
+        if data is None:
+            data = np.zeros((height, width), dtype=np.float32)
+        self.data = data
+        self._scratch = None  # Preallocated diffusion buffer
+        
+        # Callables notified with (x0, y0, x1, y1) when a region changes
+        self.change_listeners = []
+        self._mipmap = None
+    
+    @property
+    def mipmap(self):
+        """Level-of-detail pyramid over the field, built on first use"""
+        if self._mipmap is None:
+            self._mipmap = MipPyramid(lambda: self.data)
+        return self._mipmap
+    
+    def mark_dirty(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Record that a region of the field changed
+        
+        Also wakes the tiles in the region, so call this after writing to
+        data directly.
+        
+        Args:
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        wake(self.awake, self.tile_size, x0, y0, x1, y1)
+        self._notify(x0, y0, x1, y1)
+    
+    def _notify(self, x0=0, y0=0, x1=None, y1=None):
+        """Invalidate the pyramid and tell listeners about a changed region"""
+        if self._mipmap is not None:
+            self._mipmap.invalidate(x0, y0, x1, y1)
+        for listener in self.change_listeners:
+            listener(x0, y0, x1, y1)
     
     def add_energy(self, x, y, amount, radius=5):
         """Add energy at a position with a radius"""
-        for dy in range(-radius, radius + 1):
-            for dx in range(-radius, radius + 1):
-                px, py = int(x + dx), int(y + dy)
-                if 0 <= px < self.width and 0 <= py < self.height:
-                    distance = np.sqrt(dx*dx + dy*dy)
-                    if distance <= radius:
-                        falloff = 1 - (distance / radius)
-                        self.data[py, px] += amount * falloff
+        changed = stamp_add(self.data, x, y, radius, amount)
+        if changed is not None:
+            self.mark_dirty(*changed)
     
     def remove_energy(self, x, y, amount, radius=5):
         """Remove energy at a position"""
         self.add_energy(x, y, -amount, radius)
     
-    def update(self):
-        """Update energy field (apply decay and diffusion)"""
-        # Decay
-        self.data *= (1 - self.decay_rate)
+    def add_kernel(self, x, y, kernel):
+        """Add a precomputed centred kernel (e.g. a compiled spell) at a position"""
+        changed = stamp_kernel(self.data, x, y, kernel)
+        if changed is not None:
+            self.mark_dirty(*changed)
+    
+    def add_kernels(self, xs, ys, kernels, amounts=None):
+        """
+        Add many centred kernels in one scatter
         
-        # Simple diffusion (energy spreads to neighbors)
-        # Create a copy for neighbor averaging
-        diffused = np.copy(self.data)
-        for y in range(1, self.height - 1):
-            for x in range(1, self.width - 1):
-                neighbors = (
-                    self.data[y-1, x] + self.data[y+1, x] +
-                    self.data[y, x-1] + self.data[y, x+1]
-                ) / 4
-                # Blend current with neighbors (simple diffusion)
-                diffused[y, x] = self.data[y, x] * 0.8 + neighbors * 0.2
+        The result is identical to calling add_kernel for each in turn (with
+        the kernel scaled by its amount), but listeners are notified once,
+        with the bounding rectangle of every stamp.
         
-        self.data = diffused
+        Args:
+            xs, ys: Kernel centres
+            kernels: Kernel of each stamp
+            amounts: Factor for each stamp (None = add the kernels as they are)
+        """
+        touched = stamp_add_many(self.data, xs, ys, kernels, amounts)
+        if touched is None:
+            return
+        rows, cols = touched
+        self.awake[rows // self.tile_size, cols // self.tile_size] = True
+        self._notify(int(cols.min()), int(rows.min()), int(cols.max()) + 1, int(rows.max()) + 1)
+    
+    def update(self, dt=None):
+        """
+        Update energy field (apply decay and diffusion)
+        
+        Only awake tiles and their neighbours are simulated. Steps up to
+        REFERENCE_DT use the explicit stencil (exactly the classic update
+        at REFERENCE_DT), steps up to SPECTRAL_STEPS reference steps run
+        as stencil substeps, and longer steps are solved in one spectral
+        step.
+        
+        Args:
+            dt: Time step in seconds (None = one reference step)
+        """
+        steps = _steps(dt)
+        interior_shape = (max(self.height - 2, 0), max(self.width - 2, 0))
+        if self._scratch is None or self._scratch.shape != interior_shape:
+            self._scratch = np.empty(interior_shape, dtype=np.float32)
+        changed = _simulate(self.data, self.decay_rate, self._scratch, self.awake,
+                            self.tile_size, self.sleep_threshold, steps)
+        if changed is not None:
+            self._notify(*changed)
+    
+    @property
+    def awake_fraction(self):
+        """Fraction of tiles currently being simulated"""
+        return float(self.awake.mean())
     
     def get_value(self, x, y):
         """Get energy level at position"""
         if 0 <= x < self.width and 0 <= y < self.height:
             return self.data[int(y), int(x)]
         return 0
+    
+    def sample(self, xs, ys, mode="nearest"):
+        """
+        Get energy levels at many positions at once
+        
+        Args:
+            xs, ys: Position arrays
+            mode: "nearest" (same as get_value) or "bilinear"
+        
+        Returns:
+            Array of energy levels; out-of-bounds positions read as 0
+        """
+        return sample_array(self.data, xs, ys, mode, default=0.0)
+
+
+class EnergyStack:
+    """
+    Several energy types stored as channels of one (C, H, W) array
+    
+    Decay and diffusion run over every channel in one vectorized pass.
+    Each channel is also exposed as an EnergyField view in `fields`, so
+    code working with single energy fields keeps working unchanged.
+    """
+    
+    def __init__(self, width, height, decay_rates, tile_size=32, sleep_threshold=1e-4,
+                 data=None, awake=None):
+        """
+        Initialize an energy stack
+        
+        Args:
+            width: Field width
+            height: Field height
+            decay_rates: Dict of energy type -> decay rate (channel order)
+            tile_size: Edge length of the tiles used for activity tracking
+            sleep_threshold: Largest |energy| a sleeping tile may hold
+            data: Existing zeroed float32 (channels, height, width) array to
+                use as storage, e.g. in shared memory
+            awake: Existing cleared boolean (channels, rows, cols) tile mask
+        """
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.sleep_threshold = sleep_threshold
+        self.types = list(decay_rates)
+        if data is None:
+            data = np.zeros((len(self.types), height, width), dtype=np.float32)
+        self.data = data
+        if awake is None:
+            awake = np.zeros((len(self.types),) + tile_grid(width, height, tile_size),
+                             dtype=bool)
+        self.awake = awake
+        self._scratch = np.empty((len(self.types), max(height - 2, 0), max(width - 2, 0)),
+                                 dtype=np.float32)
+        self.fields = {
+            energy_type: EnergyField(width, height, energy_type, decay_rate=rate,
+                                     data=self.data[channel], tile_size=tile_size,
+                                     sleep_threshold=sleep_threshold,
+                                     awake=self.awake[channel])
+            for channel, (energy_type, rate) in enumerate(decay_rates.items())
+        }
+    
+    @property
+    def decay_rates(self):
+        """Per-channel decay rates (read from the field views)"""
+        return np.array([self.fields[t].decay_rate for t in self.types])
+    
+    def channel(self, energy_type):
+        """Index of an energy type's channel"""
+        return self.types.index(energy_type)
+    
+    def update(self, dt=None):
+        """
+        Update every channel (apply decay and diffusion)
+        
+        Args:
+            dt: Time step in seconds (None = one reference step); see
+                EnergyField.update
+        """
+        steps = _steps(dt)
+        # Decay, one rate per channel
+        decay_rates = self.decay_rates[:, np.newaxis, np.newaxis]
+        changed = _simulate(self.data, decay_rates, self._scratch, self.awake,
+                            self.tile_size, self.sleep_threshold, steps)
+        if changed is not None:
+            for field in self.fields.values():
+                field._notify(*changed)
+    
+    def react(self, reactions, dt=None):
+        """
+        Apply a reaction table across all channels in one pass
+        
+        Args:
+            reactions: List of Reaction (see game.core.reactions)
+            dt: Time step in seconds (None = one reference step)
+        
+        Returns:
+            Dict of reaction name -> energy lost this step (negative for
+            a net gain)
+        """
+        steps = _steps(dt)
+        active = self.awake.any(axis=0)
+        losses, changed = react(self.data, self.types, active, self.tile_size, reactions, steps)
+        if changed is not None:
+            for field in self.fields.values():
+                field._notify(*changed)
+        return losses
@@ -0,0 +1,265 @@
+"""Array-backed networks of energy nodes"""
+import numpy as np
+
+
+class EnergyNetwork:
+    """
+    Many connected energy nodes stored as NumPy arrays
+    
+    Capacities, levels and flow rates live in one array each, and the
+    directed connections are kept as a CSR adjacency (indptr, indices)
+    rebuilt lazily after edits. flow() moves energy along every edge in a
+    single vectorized step. add_node hands out NetworkNode handles with
+    the EnergyNode interface for code that works one node at a time.
+    """
+    
+    def __init__(self, initial_capacity=64):
+        """
+        Initialize an empty network
+        
+        Args:
+            initial_capacity: Number of nodes to allocate room for up front
+        """
+        self.size = 0
+        self._capacity = np.zeros(initial_capacity)
+        self._current = np.zeros(initial_capacity)
+        self._flow_rate = np.zeros(initial_capacity)
+        
+        # Edges in insertion order, plus a set for O(1) duplicate checks
+        self._sources = []
+        self._targets = []
+        self._edge_set = set()
+        self._csr = None  # Cached (indptr, indices), None when stale
+    
+    @property
+    def capacity(self):
+        """Maximum energy storage per node"""
+        return self._capacity[:self.size]
+    
+    @property
+    def current(self):
+        """Current energy level per node"""
+        return self._current[:self.size]
+    
+    @property
+    def flow_rate(self):
+        """Rate of energy transfer per node"""
+        return self._flow_rate[:self.size]
+    
+    @property
+    def num_edges(self):
+        """Number of directed connections"""
+        return len(self._sources)
+    
+    def add_node(self, capacity=100, current=0, flow_rate=1.0):
+        """
+        Add a node to the network
+        
+        Args:
+            capacity: Maximum energy storage
+            current: Current energy level
+            flow_rate: Rate of energy transfer
+        
+        Returns:
+            NetworkNode handle for the new node
+        """
+        return self.node(self.add_nodes([capacity], [current], [flow_rate])[0])
+    
+    def add_nodes(self, capacity, current=0, flow_rate=1.0):
+        """
+        Add many nodes at once
+        
+        Args:
+            capacity: Capacities (array)
+            current: Starting levels (array or scalar)
+            flow_rate: Flow rates (array or scalar)
+        
+        Returns:
+            Array of the new node indices
+        """
+        capacity = np.atleast_1d(np.asarray(capacity, dtype=np.float64))
+        count = len(capacity)
+        start, stop = self.size, self.size + count
+        if stop > len(self._capacity):
+            self._grow(max(stop, 2 * len(self._capacity)))
+        self._capacity[start:stop] = capacity
+        self._current[start:stop] = np.minimum(current, capacity)
+        self._flow_rate[start:stop] = flow_rate
+        self.size = stop
+        self._csr = None
+        return np.arange(start, stop)
+    
+    def _grow(self, length):
+        """Reallocate the node arrays with room for `length` nodes"""
+        for name in ("_capacity", "_current", "_flow_rate"):
+            old = getattr(self, name)
+            new = np.zeros(length)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    def node(self, index):
+        """EnergyNode-like handle for a node index"""
+        return NetworkNode(self, int(index))
+    
+    def connect(self, source, target):
+        """
+        Connect one node to another for energy flow (source -> target)
+        
+        Args:
+            source, target: Node indices
+        
+        Returns:
+            True if the connection is new
+        """
+        edge = (int(source), int(target))
+        if edge in self._edge_set:
+            return False
+        self._edge_set.add(edge)
+        self._sources.append(edge[0])
+        self._targets.append(edge[1])
+        self._csr = None
+        return True
+    
+    def connect_many(self, sources, targets):
+        """Connect many (source, target) pairs; duplicates are skipped"""
+        for source, target in zip(np.asarray(sources).tolist(), np.asarray(targets).tolist()):
+            self.connect(source, target)
+    
+    @property
+    def csr(self):
+        """
+        CSR adjacency of the network
+        
+        Returns:
+            (indptr, indices): targets of node i are indices[indptr[i]:indptr[i + 1]]
+        """
+        if self._csr is None:
+            sources = np.asarray(self._sources, dtype=np.int64)
+            targets = np.asarray(self._targets, dtype=np.int64)
+            order = np.argsort(sources, kind="stable")
+            counts = np.bincount(sources, minlength=self.size)
+            indptr = np.concatenate(([0], np.cumsum(counts)))
+            self._csr = (indptr, targets[order])
+        return self._csr
+    
+    def neighbors(self, index):
+        """Indices of the nodes a node is connected to"""
+        indptr, indices = self.csr
+        return indices[indptr[index]:indptr[index + 1]]
+    
+    def flow(self):
+        """
+        Move energy along every connection at once
+        
+        Each edge carries the same amount as EnergyNode.flow_to would,
+        (source - target) / 2 * source flow rate, computed from the levels
+        before the step. A source whose edges would take more than it holds
+        has all its outflows scaled down so it stops at zero, and a target
+        is capped at its capacity (the excess is lost, as with EnergyNode).
+        
+        Returns:
+            Array of the energy removed along each edge, in CSR order
+        """
+        indptr, targets = self.csr
+        sources = np.repeat(np.arange(self.size), np.diff(indptr))
+        current = self.current
+        gradient = np.maximum(current[sources] - current[targets], 0) / 2
+        transfer = np.minimum(gradient * self.flow_rate[sources], current[sources])
+        
+        # Clamp total outflow to what each source holds
+        outflow = np.bincount(sources, weights=transfer, minlength=self.size)
+        over = outflow > current
+        if over.any():
+            scale = np.ones(self.size)
+            scale[over] = current[over] / outflow[over]
+            transfer *= scale[sources]
+            outflow = np.bincount(sources, weights=transfer, minlength=self.size)
+        inflow = np.bincount(targets, weights=transfer, minlength=self.size)
+        
+        levels = np.maximum(current - outflow, 0)
+        np.minimum(levels + inflow, self.capacity, out=current)
+        return transfer
+    
+    def total_energy(self):
+        """Sum of all node levels"""
+        return float(self.current.sum())
+
+
+class NetworkNode:
+    """Handle to one node of an EnergyNetwork, with the EnergyNode interface"""
+    
+    __slots__ = ("network", "index")
+    
+    def __init__(self, network, index):
+        """
+        Initialize a handle
+        
+        Args:
+            network: EnergyNetwork holding the node
+            index: Node index in the network
+        """
+        self.network = network
+        self.index = index
+    
+    def __eq__(self, other):
+        return (isinstance(other, NetworkNode) and other.network is self.network
+                and other.index == self.index)
+    
+    def __hash__(self):
+        return hash((id(self.network), self.index))
+    
+    @property
+    def capacity(self):
+        return float(self.network._capacity[self.index])
+    
+    @capacity.setter
+    def capacity(self, value):
+        self.network._capacity[self.index] = value
+    
+    @property
+    def current(self):
+        return float(self.network._current[self.index])
+    
+    @current.setter
+    def current(self, value):
+        self.network._current[self.index] = value
+    
+    @property
+    def flow_rate(self):
+        return float(self.network._flow_rate[self.index])
+    
+    @flow_rate.setter
+    def flow_rate(self, value):
+        self.network._flow_rate[self.index] = value
+    
+    @property
+    def connections(self):
+        """Connected nodes, as handles"""
+        return [self.network.node(i) for i in self.network.neighbors(self.index)]
+    
+    def add_energy(self, amount):
+        """Add energy to this node"""
+        old = self.current
+        self.current = min(old + amount, self.capacity)
+        return self.current - old  # Actual amount added
+    
+    def remove_energy(self, amount):
+        """Remove energy from this node"""
+        old = self.current
+        self.current = max(old - amount, 0)
+        return old - self.current  # Actual amount removed
+    
+    def connect(self, other_node):
+        """Connect this node to another for energy flow"""
+        self.network.connect(self.index, other_node.index)
+    
+    def flow_to(self, other_node):
+        """Transfer energy to another node based on gradient"""
+        if self.current > other_node.current:
+            # Energy flows from high to low
+            gradient = (self.current - other_node.current) / 2
+            transfer = min(gradient * self.flow_rate, self.current)
+            actual = self.remove_energy(transfer)
+            other_node.add_energy(actual)
+            return actual
+        return 0
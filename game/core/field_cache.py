@@ -0,0 +1,169 @@
+"""Persistent on-disk cache of generated noise fields"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from game.core.perlin import ENGINE_VERSION
+
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "OMPHALOS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "omphalos", "fields")
+)
+
+
+def field_key(width, height, seed=0, scale=0.1, octaves=6, persistence=0.5,
+              lacunarity=2.0, engine="numpy"):
+    """
+    Content address of a generated noise field
+    
+    Takes the same arguments (and defaults) as NoiseField, so a dict of
+    NoiseField parameters can be keyed without building the field. The
+    key carries the noise backend and the array engine's version.
+    
+    Returns:
+        Hex digest identifying the field
+    """
+    params = [width, height, seed, float(scale), octaves,
+              float(persistence), float(lacunarity), engine, ENGINE_VERSION]
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+class FieldCache:
+    """Directory of .npy noise fields keyed by generation parameters"""
+    
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=None):
+        """
+        Initialize a field cache
+        
+        Args:
+            directory: Directory holding the cached .npy files
+            max_bytes: Size limit; least recently used files are pruned
+                after each store (None = unlimited)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+    
+    def _path(self, key):
+        """Path of the file for a key"""
+        return os.path.join(self.directory, key + ".npy")
+    
+    def _entries(self):
+        """List (path, size, mtime) for every cached field"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Pruned concurrently
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+    
+    def load(self, key):
+        """
+        Load a cached field
+        
+        The file is memory-mapped copy-on-write, so loading is near-instant
+        and the field stays writable without touching the cached copy.
+        
+        Returns:
+            Array, or None on a cache miss
+        """
+        path = self._path(key)
+        try:
+            data = np.load(path, mmap_mode="c")
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        # Mark as recently used for pruning
+        os.utime(path)
+        return data
+    
+    def store(self, key, data):
+        """Write a field to the cache"""
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so readers never see partial data
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.max_bytes is not None:
+            self.prune(self.max_bytes)
+    
+    def size(self):
+        """Total bytes used by cached fields"""
+        return sum(size for _, size, _ in self._entries())
+    
+    def prune(self, max_bytes):
+        """
+        Delete least recently used fields until the cache fits
+        
+        Args:
+            max_bytes: Size to shrink the cache to
+        
+        Returns:
+            Number of files removed
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+    
+    def clear(self):
+        """Delete every cached field"""
+        return self.prune(0)
+
+
+def main(argv=None):
+    """Command-line interface for inspecting and pruning the cache"""
+    parser = argparse.ArgumentParser(
+        prog="python -m game.core.field_cache",
+        description="Manage the on-disk noise field cache"
+    )
+    parser.add_argument("--dir", default=DEFAULT_CACHE_DIR,
+                        help="cache directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info", help="show cache size")
+    prune = commands.add_parser("prune", help="delete least recently used fields")
+    prune.add_argument("--max-mb", type=float, required=True,
+                       help="size to shrink the cache to, in megabytes")
+    commands.add_parser("clear", help="delete every cached field")
+    args = parser.parse_args(argv)
+    
+    cache = FieldCache(args.dir)
+    if args.command == "info":
+        print(f"{args.dir}: {len(cache._entries())} fields, "
+              f"{cache.size() / 1024 / 1024:.1f} MB")
+    elif args.command == "prune":
+        removed = cache.prune(int(args.max_mb * 1024 * 1024))
+        print(f"Removed {removed} fields, {cache.size() / 1024 / 1024:.1f} MB left")
+    elif args.command == "clear":
+        removed = cache.clear()
+        print(f"Removed {removed} fields")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Mipmap / level-of-detail pyramids for 2D fields"""
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _reduce(array):
+    """
+    Halve an array with a 2x2 mean
+    
+    Odd trailing rows/columns are edge-padded, which makes the last block
+    the mean of the cells it actually covers.
+    """
+    height, width = array.shape
+    pad_y, pad_x = height % 2, width % 2
+    if pad_y or pad_x:
+        array = np.pad(array, ((0, pad_y), (0, pad_x)), mode="edge")
+    return array.reshape(array.shape[0] // 2, 2, array.shape[1] // 2, 2).mean(axis=(1, 3))
+
+
+def level_for_zoom(zoom):
+    """
+    Pick the pyramid level that matches a display zoom
+    
+    Args:
+        zoom: Screen pixels per world cell
+    
+    Returns:
+        Level whose cells are about one screen pixel (0 = full resolution)
+    """
+    if zoom >= 1:
+        return 0
+    return int(math.floor(math.log2(1 / zoom)))
+
+
+class MipPyramid:
+    """
+    Lazily built, incrementally updated 2x2-mean pyramid over a 2D array
+    
+    Level 0 is the source array itself; level n has cells covering 2^n x 2^n
+    source cells. Levels are only built when first read, and invalidated
+    rectangles are recomputed on the next read instead of the whole level.
+    """
+    
+    def __init__(self, source):
+        """
+        Initialize a pyramid
+        
+        Args:
+            source: Callable returning the current full-resolution array
+        """
+        self.source = source
+        self._levels = []  # _levels[k - 1] holds level k
+        self._dirty = []  # Pending (x0, y0, x1, y1) per built level, or None
+        self._shape = None
+    
+    def invalidate(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Mark a source rectangle as changed
+        
+        Args:
+            x0, y0: Top-left corner (inclusive) in source cells
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        for index, rect in enumerate(self._dirty):
+            scale = 2 ** (index + 1)
+            lx0, ly0 = max(x0, 0) // scale, max(y0, 0) // scale
+            lx1 = math.inf if x1 is None else -(-x1 // scale)
+            ly1 = math.inf if y1 is None else -(-y1 // scale)
+            if rect is not None:
+                lx0, ly0 = min(lx0, rect[0]), min(ly0, rect[1])
+                lx1, ly1 = max(lx1, rect[2]), max(ly1, rect[3])
+            self._dirty[index] = (lx0, ly0, lx1, ly1)
+    
+    def num_levels(self):
+        """Number of levels down to a single cell, including level 0"""
+        height, width = self.source().shape
+        return max(1, math.ceil(math.log2(max(height, width, 1)))) + 1
+    
+    def level(self, n):
+        """
+        Get a level of the pyramid, building or refreshing it as needed
+        
+        Args:
+            n: Level index (0 = source resolution)
+        
+        Returns:
+            2D array of shape ceil(height / 2^n) x ceil(width / 2^n)
+        """
+        base = self.source()
+        if n == 0:
+            return base
+        if base.shape != self._shape:
+            # Source was resized; nothing cached is valid
+            self._levels, self._dirty = [], []
+            self._shape = base.shape
+        
+        for k in range(1, n + 1):
+            prev = base if k == 1 else self._levels[k - 2]
+            if k > len(self._levels):
+                self._levels.append(_reduce(prev))
+                self._dirty.append(None)
+                continue
+            rect = self._dirty[k - 1]
+            if rect is None:
+                continue
+            level = self._levels[k - 1]
+            lx0, ly0 = rect[0], rect[1]
+            lx1 = min(rect[2], level.shape[1])
+            ly1 = min(rect[3], level.shape[0])
+            if lx0 < lx1 and ly0 < ly1:
+                level[ly0:ly1, lx0:lx1] = _reduce(prev[2 * ly0:2 * ly1, 2 * lx0:2 * lx1])
+            self._dirty[k - 1] = None
+        return self._levels[n - 1]
+    
+    def view(self, x0, y0, width, height, level):
+        """
+        Coarse view of a source rectangle
+        
+        Args:
+            x0, y0: Top-left corner in source cells
+            width, height: Rectangle size in source cells
+            level: Pyramid level to read
+        
+        Returns:
+            Slice of the level covering the rectangle (clipped to the field)
+        """
+        scale = 2 ** level
+        data = self.level(level)
+        lx0, ly0 = max(int(x0), 0) // scale, max(int(y0), 0) // scale
+        lx1 = -(-int(x0 + width) // scale)
+        ly1 = -(-int(y0 + height) // scale)
+        return data[ly0:max(ly1, ly0), lx0:max(lx1, lx0)]
+    
+    def region_mean(self, x0, y0, width, height, level):
+        """Approximate mean of a source rectangle read from a coarse level"""
+        view = self.view(x0, y0, width, height, level)
+        if view.size == 0:
+            return 0.0
+        return float(view.mean())
+
+
+class TiledMipPyramid(MipPyramid):
+    """
+    2x2-mean pyramid built tile by tile from a rectangle reader
+    
+    For fields whose full-resolution array is costly or impossible to build
+    (sparse, quantized or chunked storage, unbounded fields). Each level is
+    cut into square tiles, built from the four tiles below them and, at
+    level 1, from one source rectangle read through `read`. Only the tiles
+    a view touches are built, invalidation drops the tiles over the changed
+    rectangle, and a rectangle the reader reports as uniform stays a single
+    number all the way up. Cells match MipPyramid over the dense array.
+    """
+    
+    def __init__(self, read, width=None, height=None, tile_size=64, max_tiles=1024):
+        """
+        Initialize a pyramid
+        
+        Args:
+            read: Callable (x0, y0, x1, y1) returning the source values of a
+                rectangle, or a float when every cell of it holds that value
+            width: Source width in cells (None for unbounded)
+            height: Source height in cells (None for unbounded)
+            tile_size: Side length of a tile in level cells
+            max_tiles: Tiles kept cached; least recently used are dropped
+        """
+        self.read = read
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()  # (level, tx, ty) -> array or float
+    
+    def _extent(self, n):
+        """(width, height) of level n, None along unbounded axes"""
+        scale = 2 ** n
+        width = None if self.width is None else -(-self.width // scale)
+        height = None if self.height is None else -(-self.height // scale)
+        return width, height
+    
+    def invalidate(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Mark a source rectangle as changed
+        
+        Args:
+            x0, y0: Top-left corner (inclusive) in source cells
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        x1 = math.inf if x1 is None else x1
+        y1 = math.inf if y1 is None else y1
+        for key in list(self._tiles):
+            n, tx, ty = key
+            span = self.tile_size * 2 ** n
+            if tx * span < x1 and x0 < (tx + 1) * span and ty * span < y1 and y0 < (ty + 1) * span:
+                del self._tiles[key]
+    
+    def num_levels(self):
+        """Number of levels down to a single cell, including level 0"""
+        if self.width is None or self.height is None:
+            raise ValueError("Unbounded field has no coarsest level")
+        return max(1, math.ceil(math.log2(max(self.height, self.width, 1)))) + 1
+    
+    def _tile(self, n, tx, ty):
+        """Cells of a tile of level n >= 1 (a float when uniform)"""
+        key = (n, tx, ty)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        
+        size = self.tile_size
+        below = self._assemble(n - 1, 2 * tx * size, 2 * ty * size,
+                               2 * (tx + 1) * size, 2 * (ty + 1) * size)
+        tile = below if isinstance(below, float) else _reduce(below)
+        self._tiles[key] = tile
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+    
+    def _assemble(self, n, x0, y0, x1, y1):
+        """
+        Cells of a level n rectangle, clipped to the field
+        
+        Returns:
+            2D array, or a float when every cell holds that value
+        """
+        width, height = self._extent(n)
+        if width is not None:
+            x1 = min(x1, width)
+        if height is not None:
+            y1 = min(y1, height)
+        if n == 0:
+            return self.read(x0, y0, x1, y1)
+        
+        size = self.tile_size
+        parts = []
+        for ty in range(y0 // size, (y1 - 1) // size + 1):
+            for tx in range(x0 // size, (x1 - 1) // size + 1):
+                tile = self._tile(n, tx, ty)
+                # Overlap of this tile with the rectangle
+                sx0, sx1 = max(x0, tx * size), min(x1, (tx + 1) * size)
+                sy0, sy1 = max(y0, ty * size), min(y1, (ty + 1) * size)
+                if not isinstance(tile, float):
+                    tile = tile[sy0 - ty * size:sy1 - ty * size, sx0 - tx * size:sx1 - tx * size]
+                parts.append((tile, sx0, sy0, sx1, sy1))
+        
+        values = {part[0] for part in parts if isinstance(part[0], float)}
+        arrays = [part[0] for part in parts if not isinstance(part[0], float)]
+        if not arrays and len(values) == 1:
+            return values.pop()
+        dtype = np.result_type(*arrays) if arrays else np.float64
+        result = np.empty((y1 - y0, x1 - x0), dtype=dtype)
+        for tile, sx0, sy0, sx1, sy1 in parts:
+            result[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = tile
+        return result
+    
+    def _cells(self, n, x0, y0, x1, y1):
+        """Cells of a level n rectangle as an array, clipped to the field"""
+        width, height = self._extent(n)
+        if width is not None:
+            x1 = min(x1, width)
+        if height is not None:
+            y1 = min(y1, height)
+        if x1 <= x0 or y1 <= y0:
+            return np.empty((max(y1 - y0, 0), max(x1 - x0, 0)))
+        values = self._assemble(n, x0, y0, x1, y1)
+        if isinstance(values, float):
+            return np.full((y1 - y0, x1 - x0), values)
+        return values
+    
+    def level(self, n):
+        """
+        Get a whole level of the pyramid (bounded fields only)
+        
+        Args:
+            n: Level index (0 = source resolution)
+        
+        Returns:
+            2D array of shape ceil(height / 2^n) x ceil(width / 2^n)
+        """
+        width, height = self._extent(n)
+        if width is None or height is None:
+            raise ValueError("Unbounded field has no dense representation")
+        return self._cells(n, 0, 0, width, height)
+    
+    def view(self, x0, y0, width, height, level):
+        """
+        Coarse view of a source rectangle
+        
+        Args:
+            x0, y0: Top-left corner in source cells
+            width, height: Rectangle size in source cells
+            level: Pyramid level to read
+        
+        Returns:
+            Cells of the level covering the rectangle (clipped to the field)
+        """
+        scale = 2 ** level
+        left, top = math.floor(x0), math.floor(y0)
+        if self.width is not None:
+            left = max(left, 0)
+        if self.height is not None:
+            top = max(top, 0)
+        lx0, ly0 = left // scale, top // scale
+        lx1 = -(-math.floor(x0 + width) // scale)
+        ly1 = -(-math.floor(y0 + height) // scale)
+        return self._cells(level, lx0, ly0, max(lx1, lx0), max(ly1, ly0))
@@ -2,11 +2,24 @@
 import numpy as np
 from noise import pnoise2
 
+from game.core.perlin import pnoise2_grid, matches_pnoise
+from game.core.field_cache import field_key
+from game.core.mipmap import MipPyramid
+from game.core.sampling import sample_array
+
+
+# Available noise backends. "numpy" evaluates whole octaves over the grid
+# at once; "pnoise" calls noise.pnoise2 per pixel (the original engine).
+# "numpy" falls back to pnoise2 for seeds it cannot reproduce (see
+# matches_pnoise).
+ENGINES = ("numpy", "pnoise")
+
 
 class NoiseField:
     """Represents a procedurally generated noise field for world properties"""
     
-    def __init__(self, width, height, seed=0, scale=0.1, octaves=6, persistence=0.5, lacunarity=2.0):
+    def __init__(self, width, height, seed=0, scale=0.1, octaves=6, persistence=0.5, lacunarity=2.0,
+                 engine="numpy", data=None, cache=None):
         """
         Initialize a noise field
         
@@ -18,7 +31,12 @@ class NoiseField:
             octaves: Number of noise layers
             persistence: How much each octave contributes
             lacunarity: Frequency multiplier between octaves
+            engine: Noise backend, one of ENGINES
+            data: Precomputed field data; skips generation when given
+            cache: FieldCache to load the field from (and store it to on a miss)
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown noise engine: {engine}")
         self.width = width
         self.height = height
         self.seed = seed
@@ -26,13 +44,79 @@ class NoiseField:
         self.octaves = octaves
         self.persistence = persistence
         self.lacunarity = lacunarity
-        self.data = self._generate()
+        self.engine = engine
+        if data is None and cache is not None:
+            data = cache.load(self.cache_key())
+            if data is None:
+                data = self._generate()
+                cache.store(self.cache_key(), data)
+        self.data = self._generate() if data is None else data
+        
+        # Callables notified with (x0, y0, x1, y1) when a region changes
+        self.change_listeners = []
+        self._mipmap = None
+    
+    @property
+    def mipmap(self):
+        """Level-of-detail pyramid over the field, built on first use"""
+        if self._mipmap is None:
+            self._mipmap = MipPyramid(lambda: self.data)
+        return self._mipmap
+    
+    def mark_dirty(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Record that a region of the field changed
+        
+        Call this after writing to `data` directly; set_value does it
+        automatically.
+        
+        Args:
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        if self._mipmap is not None:
+            self._mipmap.invalidate(x0, y0, x1, y1)
+        for listener in self.change_listeners:
+            listener(x0, y0, x1, y1)
+    
+    def cache_key(self):
+        """Key identifying this field's generated data in a FieldCache"""
+        return field_key(self.width, self.height, self.seed, self.scale,
+                         self.octaves, self.persistence, self.lacunarity, self.engine)
     
     def _generate(self):
         """Generate the noise field"""
-        field = np.zeros((self.height, self.width))
-        for y in range(self.height):
-            for x in range(self.width):
+        return self._generate_region(0, 0, self.width, self.height)
+    
+    def _generate_region(self, x0, y0, width, height):
+        """
+        Generate a rectangular block of the field
+        
+        Every pixel depends only on its own coordinates, so generating a
+        region gives exactly the values the full field has there.
+        
+        Args:
+            x0, y0: Top-left corner of the region
+            width, height: Region size
+        
+        Returns:
+            float64 array of shape (height, width), normalized to 0-1
+        """
+        if self.engine == "numpy" and matches_pnoise(self.seed):
+            value = pnoise2_grid(
+                np.arange(x0, x0 + width) * self.scale,
+                np.arange(y0, y0 + height) * self.scale,
+                octaves=self.octaves,
+                persistence=self.persistence,
+                lacunarity=self.lacunarity,
+                base=self.seed
+            )
+            # Normalize to 0-1 range
+            return (value.astype(np.float64) + 1) / 2
+        
+        field = np.zeros((height, width))
+        for y in range(y0, y0 + height):
+            for x in range(x0, x0 + width):
                 value = pnoise2(
                     x * self.scale,
                     y * self.scale,
@@ -42,7 +126,7 @@ class NoiseField:
                     base=self.seed
                 )
                 # Normalize to 0-1 range
-                field[y, x] = (value + 1) / 2
+                field[y - y0, x - x0] = (value + 1) / 2
         return field
     
     def get_value(self, x, y):
@@ -51,7 +135,21 @@ class NoiseField:
             return self.data[int(y), int(x)]
         return 0.5
     
+    def sample(self, xs, ys, mode="nearest"):
+        """
+        Get values at many positions at once
+        
+        Args:
+            xs, ys: Position arrays
+            mode: "nearest" (same as get_value) or "bilinear"
+        
+        Returns:
+            Array of values; out-of-bounds positions read as 0.5
+        """
+        return sample_array(self.data, xs, ys, mode, default=0.5)
+    
     def set_value(self, x, y, value):
         """Set the value at a specific position"""
         if 0 <= x < self.width and 0 <= y < self.height:
             self.data[int(y), int(x)] = np.clip(value, 0, 1)
+            self.mark_dirty(int(x), int(y), int(x) + 1, int(y) + 1)
@@ -1,11 +1,74 @@
 """Overlay system for modifying world properties"""
+import math
+from functools import lru_cache
+
 import numpy as np
 
+from game.core.mipmap import TiledMipPyramid
+from game.core.stamp import radial_kernel, clip_stamp
+
+
+# Largest deviation from neutral (0.5) at which an overlay counts as faded
+NEUTRAL_TOLERANCE = 0.01
+
+# Storage types for overlay values. Integer storage holds grayscale codes
+# with neutral at the midpoint (128 for uint8), like the bump-map images.
+STORAGE_TYPES = {"float32": np.float32, "uint8": np.uint8, "uint16": np.uint16}
+
+
+def _code_range(dtype):
+    """(neutral code, codes per 0.5 of deviation) for an integer type"""
+    neutral = (int(np.iinfo(dtype).max) + 1) // 2
+    return neutral, neutral - 1
+
+
+@lru_cache(maxsize=None)
+def decode_table(storage):
+    """
+    Overlay value of every code of an integer storage type
+    
+    Args:
+        storage: "uint8" or "uint16"
+    
+    Returns:
+        Read-only float32 array indexed by code (neutral code -> 0.5)
+    """
+    dtype = STORAGE_TYPES[storage]
+    neutral, scale = _code_range(dtype)
+    codes = np.arange(int(np.iinfo(dtype).max) + 1)
+    table = (np.clip((codes - neutral) / scale, -1, 1) * 0.5 + 0.5).astype(np.float32)
+    table.setflags(write=False)
+    return table
+
+
+def encode(values, storage, rng=None):
+    """
+    Quantize overlay values (0-1) to codes of an integer storage type
+    
+    Args:
+        values: Overlay values
+        storage: "uint8" or "uint16"
+        rng: numpy Generator for dithered (stochastic) rounding, which is
+            unbiased on average; None rounds to nearest
+    
+    Returns:
+        Array of codes
+    """
+    dtype = STORAGE_TYPES[storage]
+    neutral, scale = _code_range(dtype)
+    codes = (np.asarray(values, dtype=np.float64) - 0.5) * (2 * scale) + neutral
+    if rng is None:
+        codes = np.rint(codes)
+    else:
+        codes = np.floor(codes + rng.random(codes.shape))
+    return np.clip(codes, 0, np.iinfo(dtype).max).astype(dtype)
+
 
 class Overlay:
     """Represents a modification overlay that can be applied to noise fields"""
     
-    def __init__(self, width, height, decay_rate=0.01):
+    def __init__(self, width, height, decay_rate=0.01, sparse=False, storage="float32",
+                 dither=False):
         """
         Initialize an overlay
         
@@ -13,13 +76,200 @@ class Overlay:
             width: Width of the overlay
             height: Height of the overlay
             decay_rate: Rate at which the overlay fades (0-1 per update)
+            sparse: Store only the bounding box of touched cells instead of
+                the whole map
+            storage: One of STORAGE_TYPES; "uint8"/"uint16" keep grayscale
+                codes (4x/2x smaller) and decode them through lookup tables
+            dither: Round stochastically when quantized values are
+                re-encoded after decay, so slow fades do not stall
         """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown overlay storage: {storage}")
         self.width = width
         self.height = height
         self.decay_rate = decay_rate
-        # Overlay data: 0.5 = neutral, >0.5 = positive, <0.5 = negative
-        self.data = np.full((height, width), 0.5, dtype=np.float32)
+        self.sparse = sparse
+        self.storage = storage
+        self.quantized = storage != "float32"
+        self._rng = np.random.default_rng(0) if dither else None
+        dtype = STORAGE_TYPES[storage]
+        self._neutral = _code_range(dtype)[0] if self.quantized else 0.5
+        # Overlay values: 0.5 = neutral, >0.5 = positive, <0.5 = negative.
+        # Only the rectangle bbox = (x0, y0, x1, y1) is stored and cells
+        # outside it are neutral; dense overlays always cover the whole map.
+        if sparse:
+            self.bbox = None
+            self._values = np.empty((0, 0), dtype=dtype)
+        else:
+            self.bbox = (0, 0, width, height)
+            self._values = np.full((height, width), self._neutral, dtype=dtype)
         self.active = True
+        
+        # Decay is applied lazily: _values hold the overlay as of tick
+        # _synced_tick, and reads bring them up to `tick` in closed form
+        # (quantized values are decayed through the lookup table instead,
+        # and only re-encoded when stamped). _deviation bounds
+        # max |value - 0.5| as of _synced_tick.
+        self.tick = 0
+        self._synced_tick = 0
+        self._deviation = 0.0
+        
+        # Callables notified with (x0, y0, x1, y1) when a region changes
+        self.change_listeners = []
+        self._mipmap = None
+    
+    @property
+    def data(self):
+        """Full-size overlay array (a materialized copy when sparse or quantized)"""
+        if not self.quantized:
+            self._materialize()
+        values = self._read(self._values)
+        if not self.sparse:
+            return values
+        data = np.full((self.height, self.width), 0.5, dtype=np.float32)
+        if self.bbox is not None:
+            x0, y0, x1, y1 = self.bbox
+            data[y0:y1, x0:x1] = values
+        return data
+    
+    @data.setter
+    def data(self, value):
+        """Replace the overlay with a full-size array (makes it dense)"""
+        self._values = encode(value, self.storage) if self.quantized else value
+        self.bbox = (0, 0, self.width, self.height)
+        self.sparse = False
+        self._synced_tick = self.tick
+        self._deviation = float(np.abs(value - 0.5).max()) if value.size else 0.0
+    
+    @property
+    def texture(self):
+        """
+        Full-size grayscale image of the overlay at the current tick
+        
+        Codes of the storage type (uint8 for float32 storage) with neutral
+        at the midpoint, ready to upload as a texture.
+        """
+        if self.quantized:
+            storage = self.storage
+            # Decay through a code -> code table, no per-cell float math
+            codes = encode(self._lookup(), storage)[self._values]
+        else:
+            storage = "uint8"
+            self._materialize()
+            codes = encode(self._values, storage)
+        dtype = STORAGE_TYPES[storage]
+        image = np.full((self.height, self.width), _code_range(dtype)[0], dtype=dtype)
+        if self.bbox is not None:
+            x0, y0, x1, y1 = self.bbox
+            image[y0:y1, x0:x1] = codes
+        return image
+    
+    @property
+    def memory_usage(self):
+        """Bytes held by the stored overlay values"""
+        return self._values.nbytes
+    
+    def _lookup(self):
+        """Value of every code at the current tick (quantized storage)"""
+        table = decode_table(self.storage)
+        elapsed = self.tick - self._synced_tick
+        if elapsed == 0:
+            return table
+        return (table - 0.5) * (1 - self.decay_rate) ** elapsed + 0.5
+    
+    def _read(self, stored):
+        """
+        Current values of (part of) the stored array
+        
+        Float storage is returned as is, so materialize it first; codes are
+        decoded, and decayed, through the lookup table.
+        """
+        if self.quantized:
+            return self._lookup()[stored]
+        return stored
+    
+    def read_region(self, x0, y0, x1, y1):
+        """
+        Overlay values of a rectangle, read from the stored bounding box
+        
+        Args:
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive)
+        
+        Returns:
+            float32 array of shape (y1 - y0, x1 - x0), or 0.5 when the
+            rectangle lies outside the stored values
+        """
+        if self.bbox is None:
+            return 0.5
+        bx0, by0, bx1, by1 = self.bbox
+        ix0, iy0 = max(x0, bx0), max(y0, by0)
+        ix1, iy1 = min(x1, bx1), min(y1, by1)
+        if ix0 >= ix1 or iy0 >= iy1:
+            return 0.5
+        if not self.quantized:
+            self._materialize()
+        values = self._read(self._values[iy0 - by0:iy1 - by0, ix0 - bx0:ix1 - bx0])
+        if (ix0, iy0, ix1, iy1) == (x0, y0, x1, y1):
+            return values
+        region = np.full((y1 - y0, x1 - x0), 0.5, dtype=np.float32)
+        region[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = values
+        return region
+    
+    @property
+    def mipmap(self):
+        """
+        Level-of-detail pyramid over the overlay, built on first use
+        
+        Tiles are read from the stored bounding box (decoding only the
+        codes they cover), so cells outside it cost nothing.
+        """
+        if self._mipmap is None:
+            self._mipmap = TiledMipPyramid(self.read_region, self.width, self.height)
+        return self._mipmap
+    
+    def mark_dirty(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Record that a region of the overlay changed
+        
+        Call this after writing to data directly, so the overlay knows how
+        far the region is from neutral.
+        
+        Args:
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        if self.bbox is not None:
+            self._materialize()
+            bx0, by0, bx1, by1 = self.bbox
+            ix0, iy0 = max(x0, bx0), max(y0, by0)
+            ix1 = bx1 if x1 is None else min(x1, bx1)
+            iy1 = by1 if y1 is None else min(y1, by1)
+            if ix0 < ix1 and iy0 < iy1:
+                region = self._read(self._values[iy0 - by0:iy1 - by0, ix0 - bx0:ix1 - bx0])
+                self._deviation = max(self._deviation, float(np.abs(region - 0.5).max()))
+        self._notify(x0, y0, x1, y1)
+    
+    def _notify(self, x0=0, y0=0, x1=None, y1=None):
+        """Invalidate the pyramid and tell listeners about a changed region"""
+        if self._mipmap is not None:
+            self._mipmap.invalidate(x0, y0, x1, y1)
+        for listener in self.change_listeners:
+            listener(x0, y0, x1, y1)
+    
+    def _grow(self, x0, y0, x1, y1):
+        """Extend the stored bounding box to cover a rectangle"""
+        if self.bbox is not None:
+            bx0, by0, bx1, by1 = self.bbox
+            if bx0 <= x0 and by0 <= y0 and x1 <= bx1 and y1 <= by1:
+                return
+            x0, y0 = min(x0, bx0), min(y0, by0)
+            x1, y1 = max(x1, bx1), max(y1, by1)
+        values = np.full((y1 - y0, x1 - x0), self._neutral, dtype=self._values.dtype)
+        if self.bbox is not None:
+            values[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0] = self._values
+        self._values = values
+        self.bbox = (x0, y0, x1, y1)
     
     def apply_effect(self, x, y, radius, intensity):
         """
@@ -30,28 +280,88 @@ class Overlay:
             radius: Effect radius
             intensity: Effect strength (-0.5 to +0.5, added to 0.5 neutral)
         """
-        for dy in range(-radius, radius + 1):
-            for dx in range(-radius, radius + 1):
-                px, py = int(x + dx), int(y + dy)
-                if 0 <= px < self.width and 0 <= py < self.height:
-                    distance = np.sqrt(dx*dx + dy*dy)
-                    if distance <= radius:
-                        # Falloff with distance
-                        falloff = 1 - (distance / radius)
-                        effect = 0.5 + (intensity * falloff)
-                        # Blend with existing overlay
-                        self.data[py, px] = np.clip(
-                            self.data[py, px] * 0.5 + effect * 0.5,
-                            0, 1
-                        )
+        weights, mask = radial_kernel(radius)
+        clipped = clip_stamp(self.width, self.height, x, y, weights.shape[0] // 2)
+        if clipped is None:
+            return
+        field_slices, kernel_slices = clipped
+        rows, cols = field_slices
+        self._materialize()
+        self._grow(cols.start, rows.start, cols.stop, rows.stop)
+        bx0, by0 = self.bbox[0], self.bbox[1]
+        region = self._values[rows.start - by0:rows.stop - by0,
+                              cols.start - bx0:cols.stop - bx0]
+        inside = mask[kernel_slices]
+        # Falloff with distance
+        effect = 0.5 + intensity * weights[kernel_slices]
+        # Blend with existing overlay
+        blended = np.clip(self._read(region) * 0.5 + effect * 0.5, 0, 1)
+        if self.quantized:
+            region[inside] = encode(blended[inside], self.storage, self._rng)
+        else:
+            region[inside] = blended[inside]
+        self._deviation = max(self._deviation, float(np.abs(self._read(region) - 0.5).max()))
+        self._notify(cols.start, rows.start, cols.stop, rows.stop)
+    
+    def _materialize(self):
+        """Apply the decay of every tick since the last sync to the stored values"""
+        elapsed = self.tick - self._synced_tick
+        if elapsed == 0 or self.bbox is None:
+            self._synced_tick = self.tick
+            return
+        # Closed form of n steps of v -> v * (1 - d) + 0.5 * d
+        factor = (1 - self.decay_rate) ** elapsed
+        if not self.quantized:
+            self._values -= 0.5
+            self._values *= factor
+            self._values += 0.5
+        elif self._rng is None:
+            self._values = encode(self._lookup(), self.storage)[self._values]
+        else:
+            self._values = encode(self._lookup()[self._values], self.storage, self._rng)
+        self._deviation *= factor
+        self._synced_tick = self.tick
+    
+    @property
+    def deviation(self):
+        """Upper bound on max |value - 0.5| at the current tick"""
+        return self._deviation * (1 - self.decay_rate) ** (self.tick - self._synced_tick)
+    
+    @property
+    def expiry_tick(self):
+        """
+        Tick at which the overlay becomes neutral (within NEUTRAL_TOLERANCE)
+        
+        Returns:
+            Tick number, or None if it never fades (decay_rate 0)
+        """
+        if self._deviation <= NEUTRAL_TOLERANCE:
+            return self._synced_tick
+        if self.decay_rate <= 0:
+            return None
+        if self.decay_rate >= 1:
+            return self._synced_tick + 1
+        ticks = math.log(NEUTRAL_TOLERANCE / self._deviation) / math.log(1 - self.decay_rate)
+        return self._synced_tick + math.ceil(ticks)
     
     def update(self):
-        """Update overlay (apply decay)"""
-        # Decay towards neutral (0.5)
-        self.data = self.data * (1 - self.decay_rate) + 0.5 * self.decay_rate
+        """
+        Update overlay (apply decay)
+        
+        Decay towards neutral (0.5) is only counted here and applied when
+        the overlay is next read, so an update costs O(1).
+        """
+        if self.bbox is None:
+            # Never touched, so already neutral
+            self.active = False
+            return
+        
+        self.tick += 1
+        self._notify(*self.bbox)
         
         # Check if overlay is effectively neutral
-        if np.allclose(self.data, 0.5, atol=0.01):
+        expiry = self.expiry_tick
+        if expiry is not None and self.tick >= expiry:
             self.active = False
     
     def combine_with_field(self, field):
@@ -60,12 +370,53 @@ class Overlay:
         
         Args:
             field: NoiseField to modify
-            
+        
         Returns:
             Modified field data
         """
+        return self.combine_region(field.data, 0, 0, self.width, self.height)
+    
+    def combine_region(self, values, x0, y0, x1, y1):
+        """
+        Combine this overlay with a rectangle of field values
+        
+        Args:
+            values: Field values for rows y0:y1 and columns x0:x1
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive)
+        
+        Returns:
+            Modified values for the rectangle
+        """
         # Convert overlay deviation to multiplicative factor
         # 0.5 = 1x (no change), 0.0 = 0x (full negative), 1.0 = 2x (full positive)
-        factor = self.data * 2
-        result = field.data * factor
-        return np.clip(result, 0, 1)
+        if self.quantized:
+            factor_table = self._lookup() * 2
+        else:
+            self._materialize()
+            factor_table = None
+        if not self.sparse:
+            factor = self._factor(self._values[y0:y1, x0:x1], factor_table)
+            result = values * factor
+            return np.clip(result, 0, 1)
+        
+        # Neutral outside the bounding box
+        result = np.clip(values, 0, 1)
+        if self.bbox is None:
+            return result
+        bx0, by0, bx1, by1 = self.bbox
+        ix0, iy0 = max(x0, bx0), max(y0, by0)
+        ix1, iy1 = min(x1, bx1), min(y1, by1)
+        if ix0 < ix1 and iy0 < iy1:
+            factor = self._factor(self._values[iy0 - by0:iy1 - by0, ix0 - bx0:ix1 - bx0],
+                                  factor_table)
+            inner = values[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] * factor
+            result[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = np.clip(inner, 0, 1)
+        return result
+    
+    @staticmethod
+    def _factor(stored, factor_table):
+        """Multiplicative factor for stored values (looked up when quantized)"""
+        if factor_table is None:
+            return stored * 2
+        return factor_table[stored]
@@ -0,0 +1,205 @@
+"""Vectorized Perlin noise matching the `noise` package's pnoise2"""
+from functools import lru_cache
+
+import numpy as np
+from noise import pnoise2
+
+
+# Version of the array engine's output. Bump whenever a change alters the
+# generated values so anything keyed on it (caches, saves) is invalidated.
+ENGINE_VERSION = 2
+
+# Ken Perlin's reference permutation, as used by noise._perlin
+_PERM = np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140,
+    36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120,
+    234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33,
+    88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74, 165, 71,
+    134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60, 211, 133,
+    230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161,
+    1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130,
+    116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250,
+    124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59, 227,
+    47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213, 119, 248, 152, 2, 44,
+    154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253, 19,
+    98, 108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228,
+    251, 34, 242, 193, 238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235,
+    249, 14, 239, 107, 49, 192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176,
+    115, 121, 50, 45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29,
+    24, 72, 243, 141, 128, 195, 78, 66, 215, 61, 156, 180
+], dtype=np.int64)
+
+# The 16 GRAD3 gradients; 2D noise uses the first two components
+_GRAD3 = np.array([
+    [1, 1, 0], [-1, 1, 0], [1, -1, 0], [-1, -1, 0],
+    [1, 0, 1], [-1, 0, 1], [1, 0, -1], [-1, 0, -1],
+    [0, 1, 1], [0, -1, 1], [0, 1, -1], [0, -1, -1],
+    [1, 0, -1], [-1, 0, -1], [0, -1, 1], [0, 1, 1]
+], dtype='<f4')
+_GRAD_X = _GRAD3[:, 0].copy()
+_GRAD_Y = _GRAD3[:, 1].copy()
+
+# GRAD4 table that noise._perlin keeps alongside PERM
+_GRAD4 = np.array([
+    [0, 1, 1, 1], [0, 1, 1, -1], [0, 1, -1, 1], [0, 1, -1, -1],
+    [0, -1, 1, 1], [0, -1, 1, -1], [0, -1, -1, 1], [0, -1, -1, -1],
+    [1, 0, 1, 1], [1, 0, 1, -1], [1, 0, -1, 1], [1, 0, -1, -1],
+    [-1, 0, 1, 1], [-1, 0, 1, -1], [-1, 0, -1, 1], [-1, 0, -1, -1],
+    [1, 1, 0, 1], [1, 1, 0, -1], [1, -1, 0, 1], [1, -1, 0, -1],
+    [-1, 1, 0, 1], [-1, 1, 0, -1], [-1, -1, 0, 1], [-1, -1, 0, -1],
+    [1, 1, 1, 0], [1, 1, -1, 0], [1, -1, 1, 0], [1, -1, -1, 0],
+    [-1, 1, 1, 0], [-1, 1, -1, 0], [-1, -1, 1, 0], [-1, -1, -1, 0]
+], dtype='<f4')
+
+# pnoise2 adds `base` on top of the lattice coordinate and never wraps, so
+# with a non-zero seed it reads past the end of its 512-entry PERM table
+# into the constants laid out after it (GRAD4, then GRAD3). Reproduce that
+# layout so existing seeded worlds come out the same.
+_PERM_EXT = np.concatenate([
+    _PERM, _PERM,
+    _GRAD4.view(np.uint8).ravel(),
+    _GRAD3.view(np.uint8).ravel(),
+]).astype(np.int64)
+
+# Bases for which pnoise2_grid can match pnoise2. The largest index
+# pnoise2 reads is base + 255 + 255, which must stay inside _PERM_EXT;
+# beyond it (and before PERM, for negative bases) pnoise2 reads whatever
+# memory the compiled extension happens to have there. Even inside the
+# range, non-zero bases rely on the extension laying out GRAD4 and GRAD3
+# after PERM, which is not a documented contract, so matches_pnoise
+# checks each base against the installed extension.
+PNOISE_BASES = range(0, len(_PERM_EXT) - 2 * 255)
+
+
+def _perm(index):
+    """Look up the permutation table the way pnoise2 does"""
+    inside = (index >= 0) & (index < len(_PERM_EXT))
+    if inside.all():
+        return _PERM_EXT[index]
+    # Beyond the reproducible layout: treat the table as periodic
+    clipped = np.clip(index, 0, len(_PERM_EXT) - 1)
+    return np.where(inside, _PERM_EXT[clipped], _PERM[index & 255])
+
+
+@lru_cache(maxsize=256)
+def matches_pnoise(base):
+    """
+    Whether pnoise2_grid reproduces the installed pnoise2 for a base
+    
+    Compares a grid of samples covering every lattice column (and rows
+    spread over the whole lattice) against pnoise2, once per base.
+    
+    Args:
+        base: Offset into the permutation table (the seed)
+    
+    Returns:
+        True if every sample is identical
+    """
+    if base not in PNOISE_BASES:
+        return False
+    xs = np.arange(256, dtype=np.float32) + np.float32(0.37)
+    ys = np.arange(0, 256, 17, dtype=np.float32) + np.float32(0.73)
+    expected = np.array([[pnoise2(float(x), float(y), base=int(base)) for x in xs] for y in ys],
+                        dtype=np.float32)
+    return bool(np.array_equal(pnoise2_grid(xs, ys, base=base), expected))
+
+
+def _grad(hash_, x, y):
+    """Dot product of the hashed gradient with (x, y)"""
+    h = hash_ & 15
+    return x * _GRAD_X[h] + y * _GRAD_Y[h]
+
+
+def _lerp(t, a, b):
+    """Linear interpolation (same operation order as the C version)"""
+    return a + t * (b - a)
+
+
+def noise2(x, y, repeatx, repeaty, base):
+    """
+    Single octave of improved Perlin noise over whole arrays
+    
+    Args:
+        x, y: float32 coordinate arrays (broadcastable)
+        repeatx, repeaty: Tiling period along each axis
+        base: Offset into the permutation table
+    
+    Returns:
+        float32 array of noise values in roughly [-1, 1]
+    """
+    repeatx = np.float32(repeatx)
+    repeaty = np.float32(repeaty)
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int64)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int64)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int64)
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int64)
+    i = (i & 255) + base
+    j = (j & 255) + base
+    ii = (ii & 255) + base
+    jj = (jj & 255) + base
+    
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * np.float32(6) - np.float32(15)) + np.float32(10))
+    fy = y * y * y * (y * (y * np.float32(6) - np.float32(15)) + np.float32(10))
+    
+    a = _perm(i)
+    aa = _perm(a + j)
+    ab = _perm(a + jj)
+    b = _perm(ii)
+    ba = _perm(b + j)
+    bb = _perm(b + jj)
+    
+    one = np.float32(1)
+    return _lerp(fy, _lerp(fx, _grad(_perm(aa), x, y),
+                           _grad(_perm(ba), x - one, y)),
+                 _lerp(fx, _grad(_perm(ab), x, y - one),
+                       _grad(_perm(bb), x - one, y - one)))
+
+
+def pnoise2_grid(xs, ys, octaves=1, persistence=0.5, lacunarity=2.0,
+                 repeatx=1024, repeaty=1024, base=0):
+    """
+    Fractal Perlin noise evaluated over a grid of coordinates
+    
+    Equivalent to calling noise.pnoise2 for every (x, y) pair, but each
+    octave is computed for the whole grid at once in float32, the same
+    precision the C extension uses. Only bases for which matches_pnoise
+    holds match pnoise2; other bases give deterministic noise of their
+    own.
+    
+    Args:
+        xs: 1D array of x coordinates (columns)
+        ys: 1D array of y coordinates (rows)
+        octaves: Number of noise layers
+        persistence: Amplitude multiplier between octaves
+        lacunarity: Frequency multiplier between octaves
+        repeatx, repeaty: Tiling period along each axis
+        base: Offset into the permutation table (the seed)
+    
+    Returns:
+        float32 array of shape (len(ys), len(xs))
+    """
+    if octaves < 1:
+        raise ValueError("Expected octaves value > 0")
+    x = np.asarray(xs, dtype=np.float32)[np.newaxis, :]
+    y = np.asarray(ys, dtype=np.float32)[:, np.newaxis]
+    base = int(base)
+    
+    if octaves == 1:
+        return np.broadcast_to(noise2(x, y, repeatx, repeaty, base),
+                               (y.shape[0], x.shape[1])).copy()
+    
+    persistence = np.float32(persistence)
+    lacunarity = np.float32(lacunarity)
+    freq = np.float32(1)
+    amp = np.float32(1)
+    total_amp = np.float32(0)
+    total = np.zeros((y.shape[0], x.shape[1]), dtype=np.float32)
+    for _ in range(octaves):
+        total += noise2(x * freq, y * freq, np.float32(repeatx) * freq,
+                        np.float32(repeaty) * freq, base) * amp
+        total_amp += amp
+        freq *= lacunarity
+        amp *= persistence
+    return total / total_amp
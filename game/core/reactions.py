@@ -0,0 +1,105 @@
+"""Reactions between energy types, applied to whole stacked fields"""
+import numpy as np
+
+from game.core.activity import tile_rects
+
+
+# Reaction kinds:
+#   annihilate: a and b cancel each other out (both lose the same amount)
+#   amplify: b is converted into a, at `efficiency` units of a per unit of b
+REACTION_KINDS = ("annihilate", "amplify")
+
+
+class Reaction:
+    """One entry of a reaction table"""
+    
+    def __init__(self, kind, a, b, rate, efficiency=1.0):
+        """
+        Initialize a reaction
+        
+        Where both energies are present, rate * min(a, b) reacts per
+        reference step.
+        
+        Args:
+            kind: One of REACTION_KINDS
+            a: First energy type (the one amplified, for "amplify")
+            b: Second energy type (the one consumed, for "amplify")
+            rate: Fraction of the smaller energy that reacts per step (0-1)
+            efficiency: Units of a gained per unit of b, for "amplify"
+        """
+        if kind not in REACTION_KINDS:
+            raise ValueError(f"Unknown reaction kind: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self.rate = rate
+        self.efficiency = efficiency
+    
+    @property
+    def name(self):
+        """Readable label, e.g. "heat annihilate cold" """
+        return f"{self.a} {self.kind} {self.b}"
+    
+    def coefficients(self):
+        """Change in (a, b) per unit reacted"""
+        if self.kind == "annihilate":
+            return -1.0, -1.0
+        return self.efficiency, -1.0
+
+
+def react(data, types, active, tile_size, reactions, steps=1):
+    """
+    Apply a reaction table to stacked energy fields in place
+    
+    All reactions read the levels from before the pass. Where several
+    reactions draw on the same energy, their amounts are scaled down so
+    no energy goes below zero. Only the given tiles are processed; a
+    reaction needs both of its energies present, so tiles where every
+    energy is asleep cannot react.
+    
+    Args:
+        data: float32 (channels, height, width) array, modified in place
+        types: Energy type of each channel
+        active: Boolean (rows, cols) mask of the tiles to process
+        tile_size: Tile edge length in cells
+        reactions: List of Reaction
+        steps: Length of the step in reference steps
+    
+    Returns:
+        (losses, changed): energy lost to each reaction (negative for a net
+        gain), keyed by reaction name, and the bounding (x0, y0, x1, y1) of
+        the processed cells, or None if nothing was processed
+    """
+    losses = {reaction.name: 0.0 for reaction in reactions}
+    if not reactions or not active.any():
+        return losses, None
+    channels, height, width = data.shape
+    first = np.array([types.index(r.a) for r in reactions])
+    second = np.array([types.index(r.b) for r in reactions])
+    # Exact compounding of the per-step rate over `steps`
+    rates = np.array([1 - (1 - r.rate) ** steps for r in reactions], dtype=np.float32)
+    # Coefficient matrix: change of each channel per unit of each reaction
+    coefficients = np.zeros((len(reactions), channels), dtype=np.float32)
+    for i, reaction in enumerate(reactions):
+        coef_a, coef_b = reaction.coefficients()
+        coefficients[i, first[i]] += coef_a
+        coefficients[i, second[i]] += coef_b
+    drawn = np.maximum(-coefficients, 0)
+    
+    rects = tile_rects(active, tile_size, width, height)
+    for x0, y0, x1, y1 in rects:
+        region = data[:, y0:y1, x0:x1]
+        present = np.maximum(region, 0)
+        amounts = rates[:, np.newaxis, np.newaxis] * np.minimum(present[first], present[second])
+        # Scale reactions that would overdraw a shared energy
+        demand = np.tensordot(drawn, amounts, axes=(0, 0))
+        over = demand > present
+        scale = np.divide(present, demand, out=np.ones_like(present), where=over)
+        amounts *= np.minimum(scale[first], scale[second])
+        region += np.tensordot(coefficients, amounts, axes=(0, 0))
+        totals = amounts.sum(axis=(1, 2), dtype=np.float64)
+        for i, reaction in enumerate(reactions):
+            losses[reaction.name] -= float(totals[i] * coefficients[i].sum(dtype=np.float64))
+    changed = (min(r[0] for r in rects), min(r[1] for r in rects),
+               max(r[2] for r in rects), max(r[3] for r in rects))
+    return losses, changed
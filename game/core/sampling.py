@@ -0,0 +1,62 @@
+"""Vectorized point sampling of 2D fields"""
+import numpy as np
+
+
+SAMPLE_MODES = ("nearest", "bilinear")
+
+
+def sample(gather, width, height, xs, ys, mode="nearest", default=0.0):
+    """
+    Sample a field at many positions at once
+    
+    Positions follow the scalar get_value convention: cell (i, j) covers
+    [i, i + 1) x [j, j + 1), and anything outside the field reads as
+    `default`. Bilinear mode treats integer coordinates as sample points and
+    interpolates towards the next cell, clamping at the far edge, so it
+    agrees with nearest mode at integer positions.
+    
+    Args:
+        gather: Callable (ix, iy) -> values for in-bounds integer indices
+        width, height: Field size (None for an unbounded axis)
+        xs, ys: Position arrays (broadcastable)
+        mode: One of SAMPLE_MODES
+        default: Value for out-of-bounds positions
+    
+    Returns:
+        Array of sampled values with the broadcast shape of xs and ys
+    """
+    if mode not in SAMPLE_MODES:
+        raise ValueError(f"Unknown sample mode: {mode}")
+    xs, ys = np.broadcast_arrays(np.asarray(xs, dtype=np.float64),
+                                 np.asarray(ys, dtype=np.float64))
+    valid = np.isfinite(xs) & np.isfinite(ys)
+    if width is not None:
+        valid &= (xs >= 0) & (xs < width)
+    if height is not None:
+        valid &= (ys >= 0) & (ys < height)
+    px, py = xs[valid], ys[valid]
+    ix = np.floor(px).astype(np.int64)
+    iy = np.floor(py).astype(np.int64)
+    
+    if mode == "nearest":
+        values = gather(ix, iy)
+    else:
+        fx, fy = px - ix, py - iy
+        ix1, iy1 = ix + 1, iy + 1
+        if width is not None:
+            ix1 = np.minimum(ix1, width - 1)
+        if height is not None:
+            iy1 = np.minimum(iy1, height - 1)
+        top = gather(ix, iy) * (1 - fx) + gather(ix1, iy) * fx
+        bottom = gather(ix, iy1) * (1 - fx) + gather(ix1, iy1) * fx
+        values = top * (1 - fy) + bottom * fy
+    
+    result = np.full(xs.shape, default, dtype=np.result_type(values, np.float32))
+    result[valid] = values
+    return result
+
+
+def sample_array(data, xs, ys, mode="nearest", default=0.0):
+    """Sample a dense (height, width) array; see sample()"""
+    height, width = data.shape
+    return sample(lambda ix, iy: data[iy, ix], width, height, xs, ys, mode, default)
@@ -0,0 +1,222 @@
+"""Precomputed radial stamp kernels for area effects"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+
+# Falloff profiles: weight at distance d for a stamp of radius r
+FALLOFFS = {
+    "linear": lambda distance, radius: 1 - distance / radius,
+    "flat": lambda distance, radius: np.ones_like(distance),
+}
+
+# Directional stamp shapes, and the half-angle of a cone in radians
+DIRECTIONAL_SHAPES = ("line", "cone")
+CONE_HALF_ANGLE = math.pi / 4
+
+# Entries kept by each kernel cache; generated spell designs can ask for
+# any number of radii and directions, so the caches are bounded
+KERNEL_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def radial_kernel(radius, shape="linear"):
+    """
+    Falloff kernel for a circular stamp
+    
+    The most recently used kernels are cached per (radius, shape) and
+    returned read-only, so every caster shares the same arrays.
+    
+    Args:
+        radius: Stamp radius in cells
+        shape: Falloff profile, one of FALLOFFS
+    
+    Returns:
+        (weights, mask): float64 weights over a (2r+1) x (2r+1) box (zero
+        outside the disc) and a boolean mask of the cells inside the disc
+    """
+    if shape not in FALLOFFS:
+        raise ValueError(f"Unknown stamp shape: {shape}")
+    extent = int(math.ceil(radius))
+    offsets = np.arange(-extent, extent + 1)
+    distance = np.sqrt(offsets[np.newaxis, :] ** 2 + offsets[:, np.newaxis] ** 2)
+    mask = distance <= radius
+    if radius > 0:
+        weights = np.where(mask, FALLOFFS[shape](distance, radius), 0.0)
+    else:
+        weights = mask.astype(np.float64)  # Single cell at full strength
+    weights.setflags(write=False)
+    mask.setflags(write=False)
+    return weights, mask
+
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def directional_kernel(radius, direction, shape="line"):
+    """
+    Falloff kernel for a stamp aimed in one direction
+    
+    The stamp starts at the centre cell and reaches `radius` cells along
+    `direction`, fading linearly with distance like a radial stamp. A line
+    is one cell wide; a cone spreads CONE_HALF_ANGLE to either side.
+    Kernels are cached and read-only, as with radial_kernel.
+    
+    Args:
+        radius: Stamp length in cells
+        direction: Angle in radians (0 = +x, pi/2 = +y)
+        shape: One of DIRECTIONAL_SHAPES
+    
+    Returns:
+        float64 weights over a (2r+1) x (2r+1) box centred on the origin
+    """
+    if shape not in DIRECTIONAL_SHAPES:
+        raise ValueError(f"Unknown stamp shape: {shape}")
+    extent = int(math.ceil(radius))
+    dy, dx = np.indices((2 * extent + 1, 2 * extent + 1)) - extent
+    along = dx * math.cos(direction) + dy * math.sin(direction)
+    across = dy * math.cos(direction) - dx * math.sin(direction)
+    distance = np.sqrt(dx ** 2 + dy ** 2)
+    if shape == "line":
+        mask = (along >= 0) & (along <= radius) & (np.abs(across) <= 0.5)
+        reach = along
+    else:
+        mask = (distance <= radius) & (along >= distance * math.cos(CONE_HALF_ANGLE))
+        reach = distance
+    if radius > 0:
+        weights = np.where(mask, 1 - reach / radius, 0.0)
+    else:
+        weights = (distance == 0).astype(np.float64)  # Single cell at full strength
+    weights.setflags(write=False)
+    return weights
+
+
+def clip_stamp(width, height, x, y, extent):
+    """
+    Clip a (2*extent+1)^2 stamp centred at (x, y) to a field
+    
+    Args:
+        width, height: Field size
+        x, y: Stamp centre
+        extent: Half-size of the stamp box in cells
+    
+    Returns:
+        (field_slices, kernel_slices) as (rows, cols) slice pairs, or None
+        if the stamp misses the field entirely
+    """
+    cx, cy = int(math.floor(x)), int(math.floor(y))
+    x0, x1 = max(cx - extent, 0), min(cx + extent + 1, width)
+    y0, y1 = max(cy - extent, 0), min(cy + extent + 1, height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    field_slices = (slice(y0, y1), slice(x0, x1))
+    kernel_slices = (slice(y0 - cy + extent, y1 - cy + extent),
+                     slice(x0 - cx + extent, x1 - cx + extent))
+    return field_slices, kernel_slices
+
+
+def stamp_add(data, x, y, radius, amount, shape="linear"):
+    """
+    Add a radial stamp of `amount` to a 2D array in place
+    
+    Args:
+        data: Array to modify
+        x, y: Stamp centre
+        radius: Stamp radius
+        amount: Value at the centre (scaled by the falloff elsewhere)
+        shape: Falloff profile, one of FALLOFFS
+    
+    Returns:
+        Modified (x0, y0, x1, y1) rectangle, or None if nothing changed
+    """
+    weights, _ = radial_kernel(radius, shape)
+    return stamp_kernel(data, x, y, weights, amount)
+
+
+def stamp_kernel(data, x, y, kernel, amount=None):
+    """
+    Add a centred kernel to a 2D array in place, clipped to its edges
+    
+    Args:
+        data: Array to modify
+        x, y: Position of the kernel centre
+        kernel: Square array of odd size
+        amount: Factor to scale the kernel by (None = add it as is)
+    
+    Returns:
+        Modified (x0, y0, x1, y1) rectangle, or None if nothing changed
+    """
+    clipped = clip_stamp(data.shape[1], data.shape[0], x, y, kernel.shape[0] // 2)
+    if clipped is None:
+        return None
+    field_slices, kernel_slices = clipped
+    if amount is None:
+        data[field_slices] += kernel[kernel_slices]
+    else:
+        data[field_slices] += amount * kernel[kernel_slices]
+    rows, cols = field_slices
+    return cols.start, rows.start, cols.stop, rows.stop
+
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def box_offsets(size):
+    """
+    Row and column offsets of every cell of a centred size x size box
+    
+    Returns:
+        (dy, dx) flat read-only arrays, in the same order as kernel.ravel()
+    """
+    dy, dx = np.indices((size, size)) - size // 2
+    dy, dx = dy.ravel(), dx.ravel()
+    dy.setflags(write=False)
+    dx.setflags(write=False)
+    return dy, dx
+
+
+def stamp_add_many(data, xs, ys, kernels, amounts=None):
+    """
+    Add many centred kernels to a 2D array in one scatter, in place
+    
+    Stamps sharing a kernel array are grouped to build their cell indices,
+    then all of them are added with a single np.add.at in the order given,
+    so the result is identical to calling stamp_kernel for each in turn.
+    
+    Args:
+        data: Array to modify
+        xs, ys: Kernel centres
+        kernels: Kernel of each stamp (square arrays of odd size)
+        amounts: Factor for each stamp (None = add the kernels as they are)
+    
+    Returns:
+        (rows, cols) of every cell written, or None if nothing changed
+    """
+    height, width = data.shape
+    cx = np.floor(np.asarray(xs, dtype=np.float64)).astype(np.int64)
+    cy = np.floor(np.asarray(ys, dtype=np.float64)).astype(np.int64)
+    groups = {}
+    for index, kernel in enumerate(kernels):
+        groups.setdefault(id(kernel), (kernel, []))[1].append(index)
+    
+    order, rows, cols, values = [], [], [], []
+    for kernel, stamps in groups.values():
+        stamps = np.array(stamps)
+        dy, dx = box_offsets(kernel.shape[0])
+        stamp_rows = cy[stamps, np.newaxis] + dy
+        stamp_cols = cx[stamps, np.newaxis] + dx
+        inside = (stamp_rows >= 0) & (stamp_rows < height) & (stamp_cols >= 0) & (stamp_cols < width)
+        if amounts is None:
+            stamp_values = np.broadcast_to(kernel.ravel(), inside.shape)
+        else:
+            stamp_values = np.asarray(amounts, dtype=np.float64)[stamps, np.newaxis] * kernel.ravel()
+        order.append(np.broadcast_to(stamps[:, np.newaxis], inside.shape)[inside])
+        rows.append(stamp_rows[inside])
+        cols.append(stamp_cols[inside])
+        values.append(stamp_values[inside])
+    if not sum(len(o) for o in order):
+        return None
+    
+    # Back into the order the stamps were given, for identical rounding
+    sequence = np.argsort(np.concatenate(order), kind="stable")
+    rows = np.concatenate(rows)[sequence]
+    cols = np.concatenate(cols)[sequence]
+    np.add.at(data, (rows, cols), np.concatenate(values)[sequence])
+    return rows, cols
@@ -0,0 +1,118 @@
+"""Compiled spell effects - precomputed kernels shared by every caster"""
+import math
+from functools import lru_cache
+
+from game.core.stamp import radial_kernel, directional_kernel, DIRECTIONAL_SHAPES
+
+
+# Effect patterns a spell can have; "drain" is a radial stamp that removes energy
+EFFECT_TYPES = ("radius", "drain") + DIRECTIONAL_SHAPES
+
+# Aiming directions precomputed for line and cone effects
+DIRECTIONS = 16
+
+
+class SpellEffect:
+    """
+    Immutable, compiled form of a spell design
+    
+    Holds a read-only kernel already scaled by its power (and negated for
+    drains), shared by every energy type the spell combines, and for line
+    and cone effects one such kernel per aiming direction. Casting is then a clipped
+    array add per channel. Get these from compile_spell rather than
+    building them, so every caster of the same design shares one.
+    """
+    
+    def __init__(self, energy_types, effect_type, radius, power):
+        """
+        Compile a spell design
+        
+        Args:
+            energy_types: Tuple of the energy types the spell affects
+            effect_type: One of EFFECT_TYPES
+            radius: Effect radius (length, for line and cone effects)
+            power: Effect strength at the centre
+        """
+        if effect_type not in EFFECT_TYPES:
+            raise ValueError(f"Unknown effect type: {effect_type}")
+        directional = effect_type in DIRECTIONAL_SHAPES
+        if directional:
+            shapes = [directional_kernel(radius, 2 * math.pi * i / DIRECTIONS, effect_type)
+                      for i in range(DIRECTIONS)]
+        else:
+            shapes = [radial_kernel(radius)[0]]
+        amount = -power if effect_type == "drain" else power
+        scaled = [amount * shape for shape in shapes]
+        for kernel in scaled:
+            kernel.setflags(write=False)
+        # Per direction, the same kernel for every channel, made once so
+        # casts of one spell hand the same array to a CastQueue and batch
+        kernels = tuple((kernel,) * len(energy_types) for kernel in scaled)
+        
+        for name, value in (("energy_types", tuple(energy_types)), ("effect_type", effect_type),
+                            ("radius", radius), ("power", power),
+                            ("directional", directional), ("kernels", kernels)):
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("SpellEffect is immutable")
+    
+    def channels(self, direction=0.0):
+        """
+        Kernels for one cast
+        
+        Args:
+            direction: Aim in radians, rounded to one of DIRECTIONS
+                (ignored for radial effects)
+        
+        Returns:
+            Tuple of read-only (size, size) kernels, one per energy type
+        """
+        if not self.directional:
+            return self.kernels[0]
+        return self.kernels[round(direction * DIRECTIONS / (2 * math.pi)) % DIRECTIONS]
+    
+    def apply(self, energy_fields, x, y, direction=0.0, queue=None):
+        """
+        Stamp the effect onto energy fields
+        
+        Args:
+            energy_fields: Dict of energy type -> EnergyField (types the
+                spell affects but the dict lacks are skipped), or a single
+                EnergyField that receives the first channel
+            x, y: Effect centre (start of a line or cone)
+            direction: Aim in radians, for line and cone effects
+            queue: CastQueue to defer the stamps to (None = apply now)
+        """
+        kernels = self.channels(direction)
+        if isinstance(energy_fields, dict):
+            targets = [(energy_fields[energy_type], kernel)
+                       for energy_type, kernel in zip(self.energy_types, kernels)
+                       if energy_type in energy_fields]
+        else:
+            targets = [(energy_fields, kernels[0])]
+        for energy_field, kernel in targets:
+            if queue is not None:
+                queue.add(energy_field, x, y, kernel)
+            else:
+                energy_field.add_kernel(x, y, kernel)
+
+
+@lru_cache(maxsize=1024)
+def compile_spell(energy_types, effect_type, radius, power):
+    """
+    Compiled effect for a spell design, memoized across all spells
+    
+    The most recently used 1024 designs are kept; spells of an evicted
+    design simply compile it again.
+    
+    Args:
+        energy_types: Tuple of energy types
+        effect_type: One of EFFECT_TYPES
+        radius: Effect radius
+        power: Effect strength
+    
+    Returns:
+        Shared SpellEffect
+    """
+    return SpellEffect(energy_types, effect_type, radius, power)
@@ -1,50 +1,249 @@
 """Evocation - Push/Pull energy mechanics"""
-from game.core.energy import EnergyField
+import numpy as np
+
+from game.core.stamp import radial_kernel
+from game.magic.stats import StatPool
+
+
+# Stamp radius of an evocation
+EVOCATION_RADIUS = 3
+
+# Caster modes
+_IDLE, _PUSH, _PULL = 0, 1, -1
+
+
+class EvocationEngine:
+    """
+    Evocation state of many casters stored as NumPy arrays
+    
+    Each caster is a row: push/pull mode, target, energy type and surge
+    flag live in one array each, and the caster's PlayerStats join the
+    engine's StatPool so reserves are arrays too. update() checks and
+    drains every reserve and stamps every field in one vectorized step.
+    Evocation objects are views of single rows.
+    """
+    
+    def __init__(self, initial_capacity=64):
+        """
+        Initialize an engine with no casters
+        
+        Args:
+            initial_capacity: Number of casters to allocate room for up front
+        """
+        self.size = 0
+        self.pool = StatPool(initial_capacity)
+        self.types = []  # Energy type names, indexed by type_index
+        self.mode = np.zeros(initial_capacity, dtype=np.int8)
+        self.target_x = np.zeros(initial_capacity)
+        self.target_y = np.zeros(initial_capacity)
+        self.type_index = np.zeros(initial_capacity, dtype=np.int64)
+        self.surge = np.zeros(initial_capacity, dtype=bool)
+    
+    def add(self, player_stats, energy_type="heat"):
+        """
+        Add an idle caster
+        
+        Args:
+            player_stats: PlayerStats of the caster (moved into self.pool)
+            energy_type: Initial energy type
+        
+        Returns:
+            Row index of the caster
+        """
+        row = self.pool.add(player_stats)
+        if row >= len(self.mode):
+            self._grow(max(row + 1, 2 * len(self.mode)))
+        self.size = row + 1
+        self.mode[row] = _IDLE
+        self.surge[row] = False
+        self.target_x[row] = self.target_y[row] = 0
+        self.type_index[row] = self.type_id(energy_type)
+        return row
+    
+    def _grow(self, length):
+        """Reallocate the caster arrays with room for `length` casters"""
+        for name in ("mode", "target_x", "target_y", "type_index", "surge"):
+            old = getattr(self, name)
+            new = np.zeros(length, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    def type_id(self, energy_type):
+        """Index of an energy type in self.types, registering new types"""
+        if energy_type not in self.types:
+            self.types.append(energy_type)
+        return self.types.index(energy_type)
+    
+    def start(self, row, mode, energy_type, target_x, target_y):
+        """Set a caster pushing (mode 1) or pulling (mode -1) at a target"""
+        self.mode[row] = mode
+        self.type_index[row] = self.type_id(energy_type)
+        self.target_x[row] = target_x
+        self.target_y[row] = target_y
+    
+    def stop(self, rows):
+        """Stop the given casters and end their surges"""
+        self.mode[rows] = _IDLE
+        self.surge[rows] = False
+    
+    def update(self, energy_fields, dt, rows=None):
+        """
+        Advance every active caster by one tick
+        
+        Same rules as the classic per-caster update, applied to all rows at
+        once: a caster whose reserve cannot cover the tick stops, the others
+        pay for it and push or pull a radial stamp at their target. The
+        stamps of each energy type go onto its field in one scatter, in row
+        order, so the fields match updating the casters one by one. Casters
+        whose energy type has no field are left alone.
+        
+        Args:
+            energy_fields: Dict of energy type -> EnergyField
+            dt: Delta time
+            rows: Caster rows to update (None = all)
+        
+        Returns:
+            Energy transferred by each updated caster (negative when
+            pulling, 0 if idle or stopped)
+        """
+        rows = np.arange(self.size) if rows is None else np.asarray(rows, dtype=np.int64)
+        transfer = np.zeros(len(rows))
+        has_field = np.array([energy_type in energy_fields for energy_type in self.types], dtype=bool)
+        live = (self.mode[rows] != _IDLE) & has_field[self.type_index[rows]]
+        if not live.any():
+            return transfer
+        casters = rows[live]
+        
+        # Calculate base transfer rate, doubled (at double cost) by surges
+        willpower = self.pool.columns["willpower"][casters]
+        charisma = self.pool.columns["charisma"][casters]
+        efficiency = np.minimum(1.0, (willpower + charisma) / 40)
+        base_rate = 5 * efficiency * dt
+        surge = self.surge[casters]
+        rate = np.where(surge, base_rate * 2, base_rate)
+        magic_cost = np.where(surge, 2 * dt, 1 * dt)
+        
+        # Casters that cannot pay (before or after their wisdom discount) stop
+        reserve = self.pool.columns["current_magic_reserve"]
+        multiplier = np.maximum(0.5, 1.0 - self.pool.columns["wisdom"][casters] / 100)
+        actual_cost = magic_cost * multiplier
+        paid = (reserve[casters] >= magic_cost) & (reserve[casters] >= actual_cost)
+        self.stop(casters[~paid])
+        reserve[casters[paid]] -= actual_cost[paid]
+        self.pool.integral["current_magic_reserve"][casters[paid]] = False
+        
+        # Apply energy transfer, one scatter per energy type
+        casters, amounts = casters[paid], rate[paid] * self.mode[casters[paid]]
+        kernel = radial_kernel(EVOCATION_RADIUS)[0]
+        for type_id in np.unique(self.type_index[casters]).tolist():
+            group = self.type_index[casters] == type_id
+            members = casters[group]
+            energy_fields[self.types[type_id]].add_kernels(
+                self.target_x[members], self.target_y[members], [kernel] * len(members),
+                amounts[group])
+        transfer[np.flatnonzero(live)[paid]] = amounts
+        return transfer
 
 
 class Evocation:
-    """Evocation magic system - direct energy manipulation"""
+    """
+    Evocation magic system - direct energy manipulation
+    
+    A standalone Evocation is a plain object that keeps its own state and
+    updates itself. Given an EvocationEngine (e.g. World.casters) it is a
+    view of one engine row instead, and the engine updates it together
+    with every other caster.
+    """
+    
+    __slots__ = ("player_stats", "engine", "row",
+                 "_mode", "_target_x", "_target_y", "_energy_type", "_surge")
     
-    def __init__(self, player_stats):
+    def __init__(self, player_stats, engine=None):
         """
         Initialize evocation system
         
         Args:
-            player_stats: PlayerStats object
+            player_stats: PlayerStats object (moved into the engine's pool)
+            engine: EvocationEngine to keep the state in, e.g. a world's
+                shared one (None = keep it in this object)
         """
         self.player_stats = player_stats
-        self.is_pushing = False
-        self.is_pulling = False
-        self.target_x = 0
-        self.target_y = 0
-        self.energy_type = "heat"
-        self.surge_active = False
+        self.engine = engine
+        self.row = None if engine is None else engine.add(player_stats)
+        self._mode = _IDLE
+        self._target_x = 0
+        self._target_y = 0
+        self._energy_type = "heat"
+        self._surge = False
+    
+    @property
+    def is_pushing(self):
+        if self.engine is None:
+            return self._mode == _PUSH
+        return bool(self.engine.mode[self.row] == _PUSH)
+    
+    @property
+    def is_pulling(self):
+        if self.engine is None:
+            return self._mode == _PULL
+        return bool(self.engine.mode[self.row] == _PULL)
+    
+    @property
+    def target_x(self):
+        if self.engine is None:
+            return self._target_x
+        return self.engine.target_x[self.row].item()
+    
+    @property
+    def target_y(self):
+        if self.engine is None:
+            return self._target_y
+        return self.engine.target_y[self.row].item()
+    
+    @property
+    def energy_type(self):
+        if self.engine is None:
+            return self._energy_type
+        return self.engine.types[self.engine.type_index[self.row]]
+    
+    @property
+    def surge_active(self):
+        if self.engine is None:
+            return self._surge
+        return bool(self.engine.surge[self.row])
+    
+    def _start(self, mode, energy_type, target_x, target_y):
+        """Start pushing or pulling at a target"""
+        if self.engine is None:
+            self._mode = mode
+            self._energy_type = energy_type
+            self._target_x = target_x
+            self._target_y = target_y
+        else:
+            self.engine.start(self.row, mode, energy_type, target_x, target_y)
     
     def start_push(self, energy_type, target_x, target_y):
         """Start pushing energy to target"""
-        self.is_pushing = True
-        self.is_pulling = False
-        self.energy_type = energy_type
-        self.target_x = target_x
-        self.target_y = target_y
+        self._start(_PUSH, energy_type, target_x, target_y)
     
     def start_pull(self, energy_type, target_x, target_y):
         """Start pulling energy from target"""
-        self.is_pulling = True
-        self.is_pushing = False
-        self.energy_type = energy_type
-        self.target_x = target_x
-        self.target_y = target_y
+        self._start(_PULL, energy_type, target_x, target_y)
     
     def stop(self):
         """Stop evocation"""
-        self.is_pushing = False
-        self.is_pulling = False
-        self.surge_active = False
+        if self.engine is None:
+            self._mode = _IDLE
+            self._surge = False
+        else:
+            self.engine.stop(self.row)
     
     def activate_surge(self):
         """Activate surge for more power"""
-        self.surge_active = True
+        if self.engine is None:
+            self._surge = True
+        else:
+            self.engine.surge[self.row] = True
     
     def update(self, energy_field, dt):
         """
@@ -53,19 +252,21 @@ class Evocation:
         Args:
             energy_field: EnergyField to modify
             dt: Delta time
-            
+        
         Returns:
             Energy amount transferred
         """
         if not (self.is_pushing or self.is_pulling):
             return 0
+        if self.engine is not None:
+            return self.engine.update({self.energy_type: energy_field}, dt, [self.row])[0].item()
         
         # Calculate base transfer rate
         efficiency = self.player_stats.get_evocation_efficiency()
         base_rate = 5 * efficiency * dt
         
         # Apply surge multiplier
-        if self.surge_active:
+        if self._surge:
             rate = base_rate * 2
             magic_cost = 2 * dt
         else:
@@ -83,11 +284,8 @@ class Evocation:
             return 0
         
         # Apply energy transfer
-        if self.is_pushing:
-            energy_field.add_energy(self.target_x, self.target_y, rate, radius=3)
+        if self._mode == _PUSH:
+            energy_field.add_energy(self._target_x, self._target_y, rate, radius=EVOCATION_RADIUS)
             return rate
-        elif self.is_pulling:
-            energy_field.remove_energy(self.target_x, self.target_y, rate, radius=3)
-            return -rate
-        
-        return 0
+        energy_field.remove_energy(self._target_x, self._target_y, rate, radius=EVOCATION_RADIUS)
+        return -rate
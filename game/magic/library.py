@@ -0,0 +1,205 @@
+"""Compact, indexed spell library files with memory-mapped loading"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+# First bytes of a library file; anything else is read as a legacy JSON list
+MAGIC = b"OMPHSPL1"
+
+# Column data is aligned to this many bytes
+_ALIGN = 64
+
+
+def is_library(filename):
+    """True if a file is in the library format (rather than legacy JSON)"""
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_library(spells, filename):
+    """
+    Write spells to a library file
+    
+    Layout: MAGIC, the header length as a little-endian uint64, a JSON
+    header (vocabularies and the dtype, shape and offset of each column),
+    then the columns as raw arrays. Strings repeated across spells (energy
+    and effect types) are stored once in the header and referenced by
+    code. Two indexes are included: the rows sorted by name, and for each
+    energy type the rows of the spells that use it.
+    
+    Args:
+        spells: Iterable of Spell
+        filename: Path to write (replaced atomically)
+    """
+    spells = list(spells)
+    energy_types = sorted({t for s in spells for t in (s.energy_type,) + s.energy_types})
+    effect_types = sorted({s.effect_type for s in spells})
+    energy_codes = {t: i for i, t in enumerate(energy_types)}
+    effect_codes = {t: i for i, t in enumerate(effect_types)}
+    
+    names = [s.name for s in spells]
+    encoded_names = [name.encode("utf-8") for name in names]
+    type_codes = [[energy_codes[t] for t in s.energy_types] for s in spells]
+    counts = [len(codes) for codes in type_codes]
+    members = [[] for _ in energy_types]
+    for row, codes in enumerate(type_codes):
+        for code in sorted(set(codes)):
+            members[code].append(row)
+    columns = {
+        # Names as one UTF-8 blob; name i is blob[name_offsets[i]:name_offsets[i + 1]]
+        "name_offsets": np.cumsum([0] + [len(n) for n in encoded_names]).astype(np.int64),
+        "names": np.frombuffer(b"".join(encoded_names), dtype=np.uint8),
+        "energy_type": np.array([energy_codes[s.energy_type] for s in spells], dtype=np.uint16),
+        "energy_types_indptr": np.concatenate(([0], np.cumsum(counts))).astype(np.uint32),
+        "energy_types": np.array([c for codes in type_codes for c in codes], dtype=np.uint16),
+        "effect_type": np.array([effect_codes[s.effect_type] for s in spells], dtype=np.uint16),
+        "radius": np.array([s.radius for s in spells], dtype=np.float64),
+        "power": np.array([s.power for s in spells], dtype=np.float64),
+        "cost": np.array([s.cost for s in spells], dtype=np.float64),
+        # Indexes: rows by name (stable, so the first of equal names comes
+        # first), and the rows using each energy type, CSR style
+        "by_name": np.array(sorted(range(len(names)), key=names.__getitem__), dtype=np.uint32),
+        "by_type_indptr": np.cumsum([0] + [len(rows) for rows in members]).astype(np.uint32),
+        "by_type": np.array([row for rows in members for row in rows], dtype=np.uint32),
+    }
+    
+    # Column offsets relative to the end of the header
+    layout, offset = {}, 0
+    for name, array in columns.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = {"version": 1, "count": len(spells), "energy_types": energy_types,
+              "effect_types": effect_types, "columns": layout}
+    # The columns start after the header, whose length depends on their offsets
+    start = 0
+    while True:
+        header["columns"] = {name: dict(entry, offset=entry["offset"] + start)
+                             for name, entry in layout.items()}
+        encoded = json.dumps(header).encode()
+        needed = -(-(len(MAGIC) + 8 + len(encoded)) // _ALIGN) * _ALIGN
+        if needed <= start:
+            break
+        start = needed
+    encoded = encoded.ljust(start - len(MAGIC) - 8)
+    layout = header["columns"]
+    
+    directory = os.path.dirname(os.path.abspath(filename))
+    # Write to a temporary file first so readers never see partial data
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(encoded)).astype("<u8").tobytes())
+            f.write(encoded)
+            for name, array in columns.items():
+                f.seek(layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class SpellLibrary:
+    """
+    Read-only spell library file, memory-mapped and paged in on demand
+    
+    Opening a library maps the whole file once and parses its header.
+    Columns are views of that mapping, paged in by the OS as they are
+    read, and a Spell is built the first time its row is asked for, so a
+    large library costs next to nothing until spells are used. The
+    mapping pins the file that was opened: save_library replacing it
+    later does not change what an open library reads. Lookups by name
+    are binary searches over the name index.
+    """
+    
+    def __init__(self, filename):
+        """
+        Open a library file
+        
+        Args:
+            filename: Path written by save_library
+        """
+        self._map = np.memmap(filename, dtype=np.uint8, mode="r")
+        if self._map[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"Not a spell library: {filename}")
+        start = len(MAGIC) + 8
+        length = int(self._map[len(MAGIC):start].view("<u8")[0])
+        header = json.loads(self._map[start:start + length].tobytes())
+        self.filename = filename
+        self.energy_types = header["energy_types"]
+        self.effect_types = header["effect_types"]
+        self._layout = header["columns"]
+        self._count = header["count"]
+        self._columns = {}
+        self._spells = {}  # Row -> Spell, for rows already paged in
+    
+    def __len__(self):
+        return self._count
+    
+    def column(self, name):
+        """Memory-mapped column of the file (read-only)"""
+        if name not in self._columns:
+            entry = self._layout[name]
+            shape, dtype = tuple(entry["shape"]), np.dtype(entry["dtype"])
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            data = self._map[entry["offset"]:entry["offset"] + nbytes]
+            self._columns[name] = data.view(dtype).reshape(shape)
+        return self._columns[name]
+    
+    def name(self, row):
+        """Name of the spell in a row, without building the Spell"""
+        offsets = self.column("name_offsets")
+        return self.column("names")[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+    
+    def __getitem__(self, row):
+        """Spell in a row, built on first access"""
+        if not -self._count <= row < self._count:
+            raise IndexError("spell library index out of range")
+        row %= self._count
+        spell = self._spells.get(row)
+        if spell is None:
+            from game.magic.spells import Spell
+            indptr = self.column("energy_types_indptr")
+            codes = self.column("energy_types")[indptr[row]:indptr[row + 1]]
+            spell = Spell(
+                self.name(row),
+                self.energy_types[self.column("energy_type")[row]],
+                self.effect_types[self.column("effect_type")[row]],
+                float(self.column("radius")[row]),
+                float(self.column("power")[row]),
+                float(self.column("cost")[row]),
+                [self.energy_types[code] for code in codes]
+            )
+            self._spells[row] = spell
+        return spell
+    
+    def find(self, name):
+        """
+        Row of the first spell with a name
+        
+        Returns:
+            Row index, or None if no spell has that name
+        """
+        by_name = self.column("by_name")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(by_name[middle]) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self.name(by_name[low]) == name:
+            return int(by_name[low])
+        return None
+    
+    def rows_with(self, energy_type):
+        """Rows of the spells that use an energy type, in row order"""
+        if energy_type not in self.energy_types:
+            return np.zeros(0, dtype=np.int64)
+        code = self.energy_types.index(energy_type)
+        indptr = self.column("by_type_indptr")
+        return self.column("by_type")[indptr[code]:indptr[code + 1]].astype(np.int64)
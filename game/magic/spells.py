@@ -1,47 +1,84 @@
 """Spell system - Scrolls and Spellbooks"""
 import json
+import sys
+from collections.abc import MutableSequence
+
+import numpy as np
+
+from game.magic.effects import EFFECT_TYPES, compile_spell
+from game.magic.library import SpellLibrary, is_library, save_library
+
+
+# Canonical energy type tuples, shared by every spell with the same types
+_ENERGY_TYPES = {}
+
+
+def _intern_types(energy_types):
+    """Shared tuple of interned energy type names"""
+    key = tuple(sys.intern(str(energy_type)) for energy_type in energy_types)
+    return _ENERGY_TYPES.setdefault(key, key)
 
 
 class Spell:
     """Represents a spell effect"""
     
-    def __init__(self, name, energy_type, effect_type, radius, power, cost):
+    __slots__ = ("name", "energy_type", "effect_type", "radius", "power", "cost", "energy_types")
+    
+    def __init__(self, name, energy_type, effect_type, radius, power, cost, energy_types=None):
         """
         Initialize a spell
         
         Args:
             name: Spell name
             energy_type: Type of energy (heat, cold, magic, etc.)
-            effect_type: Effect pattern (radius, line, cone, etc.)
+            effect_type: Effect pattern (radius, drain, line or cone)
             radius: Effect radius
             power: Effect strength
             cost: Magic cost to cast
+            energy_types: Every energy type the spell combines (None = just
+                energy_type)
         """
         self.name = name
-        self.energy_type = energy_type
-        self.effect_type = effect_type
+        # Type names repeat across many spells, so keep one copy of each
+        self.energy_type = sys.intern(str(energy_type))
+        self.effect_type = sys.intern(str(effect_type))
         self.radius = radius
         self.power = power
         self.cost = cost
+        self.energy_types = _intern_types(energy_types if energy_types else (energy_type,))
     
-    def cast(self, energy_field, x, y):
+    @property
+    def effect(self):
+        """
+        Compiled SpellEffect, shared with every spell of the same design,
+        or None if the effect type is not one of EFFECT_TYPES (such a
+        spell, e.g. from an old save, has no effect)
+        """
+        if self.effect_type not in EFFECT_TYPES:
+            return None
+        return compile_spell(self.energy_types, self.effect_type, self.radius, self.power)
+    
+    def cast(self, energy_field, x, y, queue=None, direction=0.0):
         """
         Cast the spell at a location
         
         Args:
-            energy_field: EnergyField to modify
-            x, y: Target location
+            energy_field: Dict of energy type -> EnergyField, one stamp per
+                energy type of the spell, or a single EnergyField to modify
+            x, y: Target location (start of a line or cone)
+            queue: CastQueue to defer the effect to (None = apply now)
+            direction: Aim in radians, for line and cone spells
         """
-        if self.effect_type == "radius":
-            energy_field.add_energy(x, y, self.power, self.radius)
-        elif self.effect_type == "drain":
-            energy_field.remove_energy(x, y, self.power, self.radius)
+        effect = self.effect
+        if effect is not None:
+            effect.apply(energy_field, x, y, direction, queue)
     
     def to_dict(self):
         """Convert spell to dictionary"""
         return {
             "name": self.name,
             "energy_type": self.energy_type,
+            "energy_types": list(self.energy_types),
             "effect_type": self.effect_type,
             "radius": self.radius,
             "power": self.power,
@@ -57,30 +94,151 @@ class Spell:
             data["effect_type"],
             data["radius"],
             data["power"],
-            data["cost"]
+            data["cost"],
+            data.get("energy_types")
         )
 
 
+class CastQueue:
+    """
+    Per-tick buffer of spell effects on energy fields
+    
+    Casting with a queue charges the caster at once but only records the
+    stamp. flush() then applies every recorded stamp of a field in one
+    vectorized scatter, in cast order, so the field ends up exactly as if
+    the casts had been applied one by one. World.update flushes its queue
+    before simulating.
+    """
+    
+    def __init__(self):
+        """Initialize an empty queue"""
+        # id(field) -> (field, [(x, y, kernel), ...]), one entry per energy type
+        self._casts = {}
+    
+    def __len__(self):
+        return sum(len(casts) for _, casts in self._casts.values())
+    
+    def add(self, energy_field, x, y, kernel):
+        """
+        Queue a stamp, as EnergyField.add_kernel would apply it
+        
+        Args:
+            energy_field: EnergyField to modify
+            x, y: Kernel centre
+            kernel: Precomputed kernel, e.g. a channel of a SpellEffect;
+                casts sharing one kernel array are scattered together
+        """
+        entry = self._casts.setdefault(id(energy_field), (energy_field, []))
+        entry[1].append((x, y, kernel))
+    
+    def flush(self):
+        """
+        Apply and clear every queued stamp
+        
+        Returns:
+            Number of stamps applied
+        """
+        count = 0
+        for energy_field, casts in self._casts.values():
+            xs, ys, kernels = zip(*casts)
+            energy_field.add_kernels(xs, ys, kernels)
+            count += len(casts)
+        self._casts = {}
+        return count
+
+
 class Scroll:
     """Single-use spell scroll"""
     
+    __slots__ = ("spell", "used")
+    
     def __init__(self, spell):
         """Initialize scroll with a spell"""
         self.spell = spell
         self.used = False
     
-    def cast(self, player_stats, energy_field, x, y):
-        """Cast the scroll"""
-        if self.used:
+    def cast(self, player_stats, energy_field, x, y, queue=None, direction=0.0):
+        """
+        Cast the scroll (the effect goes to `queue` if one is given)
+        
+        Scrolls of a spell without an effect fail without charging.
+        """
+        if self.used or self.spell.effect is None:
             return False
         
         if player_stats.use_magic(self.spell.cost):
-            self.spell.cast(energy_field, x, y)
+            self.spell.cast(energy_field, x, y, queue, direction)
             self.used = True
             return True
         return False
 
 
+class SpellList(MutableSequence):
+    """
+    Spellbook contents backed by a SpellLibrary, paged in on demand
+    
+    Behaves as a list of Spell. Until it is first edited it maps straight
+    onto the library rows, so name lookups use the library's index; after
+    that it keeps a list of library rows (still unloaded) and added spells.
+    """
+    
+    def __init__(self, library):
+        """
+        Initialize a list holding every spell of a library
+        
+        Args:
+            library: SpellLibrary to page spells in from
+        """
+        self.library = library
+        self._items = None  # Library rows and Spells, None until first edited
+    
+    def _entries(self):
+        """Editable list of entries (library rows or Spells)"""
+        if self._items is None:
+            self._items = list(range(len(self.library)))
+        return self._items
+    
+    def _load(self, entry):
+        """Spell for an entry"""
+        return self.library[entry] if isinstance(entry, (int, np.integer)) else entry
+    
+    def __len__(self):
+        return len(self.library) if self._items is None else len(self._items)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self._items is None:
+            return self.library[index]
+        return self._load(self._items[index])
+    
+    def __setitem__(self, index, value):
+        self._entries()[index] = value
+    
+    def __delitem__(self, index):
+        del self._entries()[index]
+    
+    def insert(self, index, value):
+        self._entries().insert(index, value)
+    
+    def find(self, name):
+        """
+        Index of the first spell with a name
+        
+        Returns:
+            Index, or None if no spell has that name
+        """
+        if self._items is None:
+            return self.library.find(name)
+        for index, entry in enumerate(self._items):
+            if isinstance(entry, (int, np.integer)):
+                if self.library.name(entry) == name:
+                    return index
+            elif entry.name == name:
+                return index
+        return None
+
+
 class Spellbook:
     """Collection of spells that can be cast multiple times"""
     
@@ -98,23 +256,58 @@ class Spellbook:
             return self.spells.pop(index)
         return None
     
-    def cast_spell(self, index, player_stats, energy_field, x, y):
-        """Cast a spell from the spellbook"""
+    def cast_spell(self, index, player_stats, energy_field, x, y, queue=None, direction=0.0):
+        """
+        Cast a spell from the spellbook (the effect goes to `queue` if one is given)
+        
+        Spells without an effect fail without charging.
+        """
         if 0 <= index < len(self.spells):
             spell = self.spells[index]
-            if player_stats.use_magic(spell.cost):
-                spell.cast(energy_field, x, y)
+            if spell.effect is not None and player_stats.use_magic(spell.cost):
+                spell.cast(energy_field, x, y, queue, direction)
                 return True
         return False
     
+    def find_spell(self, name):
+        """
+        Find a spell by name
+        
+        Returns:
+            First Spell with that name, or None
+        """
+        if isinstance(self.spells, SpellList):
+            index = self.spells.find(name)
+            return None if index is None else self.spells[index]
+        for spell in self.spells:
+            if spell.name == name:
+                return spell
+        return None
+    
     def save_to_file(self, filename):
-        """Save spellbook to file"""
+        """
+        Save spellbook to file
+        
+        Files named *.json are written as a legacy JSON list, anything else
+        in the indexed library format (see save_library).
+        """
+        if not filename.endswith(".json"):
+            save_library(self.spells, filename)
+            return
         data = [spell.to_dict() for spell in self.spells]
         with open(filename, 'w') as f:
             json.dump(data, f, indent=2)
     
     def load_from_file(self, filename):
-        """Load spellbook from file"""
+        """
+        Load spellbook from file
+        
+        Library files are memory-mapped and their spells paged in when
+        first used; legacy JSON files are read in full.
+        """
+        if is_library(filename):
+            self.spells = SpellList(SpellLibrary(filename))
+            return
         with open(filename, 'r') as f:
             data = json.load(f)
         self.spells = [Spell.from_dict(spell_data) for spell_data in data]
@@ -1,11 +1,115 @@
 """Player statistics and attributes"""
+import numpy as np
+
+
+# Attributes kept in StatPool columns for batched systems such as evocation
+POOLED_STATS = ("willpower", "wisdom", "charisma", "max_magic_reserve", "current_magic_reserve")
+
+
+class _Pooled:
+    """
+    PlayerStats attribute stored in its pool's column once the stats join
+    a StatPool, and in the "_<name>" slot until then
+    """
+    
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = "_" + name
+    
+    def __get__(self, stats, owner=None):
+        if stats is None:
+            return self
+        if stats.pool is None:
+            return getattr(stats, self.slot)
+        value = stats.pool.columns[self.name][stats.row].item()
+        return int(value) if stats.pool.integral[self.name][stats.row] else value
+    
+    def __set__(self, stats, value):
+        if stats.pool is None:
+            setattr(stats, self.slot, value)
+        else:
+            stats.pool.columns[self.name][stats.row] = value
+            stats.pool.integral[self.name][stats.row] = _is_integral(value)
+
+
+def _is_integral(value):
+    """True for int values, which a pool hands back as int rather than float"""
+    return isinstance(value, (int, np.integer))
+
+
+class StatPool:
+    """
+    Struct-of-arrays storage for the stats of many characters
+    
+    Each member PlayerStats becomes a view of one row: its POOLED_STATS
+    attributes read and write float64 columns here, so batched systems
+    can check and drain every reserve at once. `integral` records which
+    values were set as ints so they read back as ints; batched systems
+    that write fractions to a column clear its flags.
+    """
+    
+    def __init__(self, initial_capacity=64):
+        """
+        Initialize an empty pool
+        
+        Args:
+            initial_capacity: Number of rows to allocate room for up front
+        """
+        self.size = 0
+        self.columns = {name: np.zeros(initial_capacity) for name in POOLED_STATS}
+        self.integral = {name: np.zeros(initial_capacity, dtype=bool) for name in POOLED_STATS}
+    
+    def add(self, stats):
+        """
+        Move a PlayerStats into the pool
+        
+        Args:
+            stats: PlayerStats not yet in any pool
+        
+        Returns:
+            Row index of the stats
+        """
+        if stats.pool is not None:
+            raise ValueError("PlayerStats already belong to a pool")
+        capacity = len(self.columns[POOLED_STATS[0]])
+        if self.size == capacity:
+            for arrays in (self.columns, self.integral):
+                for name, old in arrays.items():
+                    new = np.zeros(max(1, 2 * capacity), dtype=old.dtype)
+                    new[:capacity] = old
+                    arrays[name] = new
+        row = self.size
+        for name in POOLED_STATS:
+            value = getattr(stats, name)
+            self.columns[name][row] = value
+            self.integral[name][row] = _is_integral(value)
+        stats.pool, stats.row = self, row
+        self.size += 1
+        return row
+    
+    def column(self, name):
+        """Values of one pooled attribute, one per row"""
+        return self.columns[name][:self.size]
 
 
 class PlayerStats:
     """Player character statistics"""
     
+    __slots__ = ("pool", "row", "intelligence", "dexterity", "experience", "level") + tuple(
+        "_" + name for name in POOLED_STATS)
+    
+    willpower = _Pooled()
+    wisdom = _Pooled()
+    charisma = _Pooled()
+    max_magic_reserve = _Pooled()
+    current_magic_reserve = _Pooled()
+    
     def __init__(self):
         """Initialize player stats"""
+        # StatPool holding the pooled attributes, and the row in it (None = held here)
+        self.pool = None
+        self.row = None
+        
         # Core attributes
         self.willpower = 10  # Evocation efficiency and surge power
         self.wisdom = 10     # Spell cost reduction
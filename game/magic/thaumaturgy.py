@@ -1,4 +1,5 @@
 """Thaumaturgy - Custom spell design"""
+from game.magic.effects import EFFECT_TYPES, compile_spell
 from game.magic.spells import Spell
 
 
@@ -21,13 +22,18 @@ class Thaumaturgy:
         Args:
             name: Spell name
             energy_types: List of energy types to combine
-            effect_type: Effect pattern
+            effect_type: Effect pattern (radius, drain, line or cone)
             radius: Effect radius
             power: Effect strength
-            
+        
         Returns:
-            Spell object if successful, None if too complex
+            Spell object if successful, None if too complex or the effect
+            type is unknown; its effect is compiled here and shared with
+            every spell of the same design
         """
+        if effect_type not in EFFECT_TYPES:
+            return None
+        
         # Check complexity
         complexity = len(energy_types)
         max_complexity = self.player_stats.get_spell_complexity()
@@ -38,18 +44,21 @@ class Thaumaturgy:
         # Calculate base cost
         base_cost = (radius * power * complexity) / 10
         
-        # Combine energy types (use first for now, can be extended)
-        primary_energy = energy_types[0] if energy_types else "magic"
+        # Combine energy types (the first one is the spell's primary type)
+        energy_types = list(energy_types) or ["magic"]
         
         # Create the spell
         spell = Spell(
             name=name,
-            energy_type=primary_energy,
+            energy_type=energy_types[0],
             effect_type=effect_type,
             radius=radius,
             power=power,
-            cost=base_cost
+            cost=base_cost,
+            energy_types=energy_types
         )
+        # Compile now rather than on the first cast
+        compile_spell(spell.energy_types, spell.effect_type, spell.radius, spell.power)
         
         return spell
     
@@ -60,7 +69,7 @@ class Thaumaturgy:
         
         Args:
             spell: Spell to embed in scroll
-            
+        
         Returns:
             Scroll object if successful
         """
@@ -80,7 +89,7 @@ class Thaumaturgy:
         Args:
             spell: Spell to add
             spellbook: Spellbook to add to
-            
+        
         Returns:
             True if successful
         """
@@ -98,7 +107,7 @@ class Thaumaturgy:
         Args:
             spell: Spell to embed
             object_data: Object to enchant
-            
+        
         Returns:
             Enchanted object data
         """
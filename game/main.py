@@ -4,6 +4,7 @@ import sys
 from game.world.world import World
 from game.world.player import Player
 from game.magic.spells import Spell
+from game.core.mipmap import level_for_zoom
 
 
 class Game:
@@ -16,7 +17,7 @@ class Game:
         
         # Game state
         self.world = World(width=200, height=200)
-        self.player = Player(x=100, y=100)
+        self.player = Player(x=100, y=100, casters=self.world.casters)
         
         # Camera
         self.camera_x = 0
@@ -54,6 +55,22 @@ class Game:
         screen_y = (world_y - self.camera_y) * self.zoom
         return int(screen_x), int(screen_y)
     
+    def get_visible_region(self, pyramid):
+        """
+        Get the on-screen part of a field at the current zoom level
+        
+        Args:
+            pyramid: MipPyramid of the field (e.g. world.terrain_mipmap)
+            
+        Returns:
+            Array with about one cell per screen pixel when zoomed out
+        """
+        return pyramid.view(
+            self.camera_x, self.camera_y,
+            self.screen_width / self.zoom, self.screen_height / self.zoom,
+            level_for_zoom(self.zoom)
+        )
+    
     def update(self, dt):
         """Update game state"""
         # Update camera to follow player
@@ -1,4 +1,6 @@
 """Player character and interaction"""
+import math
+
 from game.magic.stats import PlayerStats
 from game.magic.evocation import Evocation
 from game.magic.spells import Spellbook
@@ -8,19 +10,23 @@ from game.magic.thaumaturgy import Thaumaturgy
 class Player:
     """Player character"""
     
-    def __init__(self, x=100, y=100):
+    def __init__(self, x=100, y=100, casters=None):
         """
         Initialize player
         
         Args:
             x, y: Starting position
+            casters: EvocationEngine to evoke through, normally
+                World.casters, which the world then updates with every
+                other caster (None = a standalone Evocation that
+                Player.update steps on its own)
         """
         self.x = x
         self.y = y
         self.stats = PlayerStats()
         
         # Magic systems
-        self.evocation = Evocation(self.stats)
+        self.evocation = Evocation(self.stats, casters)
         self.spellbook = Spellbook()
         self.thaumaturgy = Thaumaturgy(self.stats)
         
@@ -49,29 +55,39 @@ class Player:
         """Stop evocation"""
         self.evocation.stop()
     
+    def _aim(self, spell, target_x, target_y):
+        """Origin and direction of a cast: line and cone spells start at the player"""
+        direction = math.atan2(target_y - self.y, target_x - self.x)
+        effect = spell.effect
+        if effect is not None and effect.directional:
+            return self.x, self.y, direction
+        return target_x, target_y, direction
+    
     def cast_spell(self, spell_index, world, target_x, target_y):
-        """Cast a spell from spellbook"""
-        energy_field = world.energy_fields.get("magic")
-        if energy_field:
+        """Cast a spell from spellbook (applied at the next world update)"""
+        if world.energy_fields and 0 <= spell_index < len(self.spellbook.spells):
+            x, y, direction = self._aim(self.spellbook.spells[spell_index], target_x, target_y)
             return self.spellbook.cast_spell(
-                spell_index, self.stats, energy_field, target_x, target_y
+                spell_index, self.stats, world.energy_fields, x, y,
+                world.cast_queue, direction
             )
         return False
     
     def use_scroll(self, scroll_index, world, target_x, target_y):
-        """Use a scroll"""
-        if 0 <= scroll_index < len(self.scrolls):
+        """Use a scroll (applied at the next world update)"""
+        if world.energy_fields and 0 <= scroll_index < len(self.scrolls):
             scroll = self.scrolls[scroll_index]
-            energy_field = world.energy_fields.get("magic")
-            if energy_field and scroll.cast(self.stats, energy_field, target_x, target_y):
+            x, y, direction = self._aim(scroll.spell, target_x, target_y)
+            if scroll.cast(self.stats, world.energy_fields, x, y, world.cast_queue, direction):
                 self.scrolls.pop(scroll_index)
                 return True
         return False
     
     def update(self, world, dt):
         """Update player state"""
-        # Update evocation
-        if self.evocation.is_pushing or self.evocation.is_pulling:
+        # Update evocation (World.update does it for the world's casters)
+        evoking = self.evocation.is_pushing or self.evocation.is_pulling
+        if evoking and self.evocation.engine is not world.casters:
             energy_type = self.evocation.energy_type
             if energy_type in world.energy_fields:
                 self.evocation.update(world.energy_fields[energy_type], dt)
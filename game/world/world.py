@@ -1,13 +1,74 @@
 """World state and management"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
 from game.core.noise_field import NoiseField
 from game.core.overlay import Overlay
-from game.core.energy import EnergyField
+from game.core.energy import EnergyStack
+from game.core.domain import DistributedEnergyStack
+from game.core.reactions import Reaction
+from game.core.parallel import generate_fields
+from game.core.mipmap import MipPyramid
+from game.core.sampling import sample_array
+from game.magic.spells import CastQueue
+from game.magic.evocation import EvocationEngine
+
+
+# Biome names, indexed by the values classify_biomes returns
+BIOMES = ("plains", "water", "tundra", "desert", "mountain")
+
+
+def classify_biomes(terrain, temperature):
+    """
+    Classify biomes from terrain and temperature values
+    
+    Args:
+        terrain: Composited terrain value(s)
+        temperature: Temperature value(s)
+        
+    Returns:
+        uint8 index (or array of indices) into BIOMES
+    """
+    terrain = np.asarray(terrain)
+    temperature = np.asarray(temperature)
+    return np.select(
+        [terrain > 0.7, terrain < 0.3, temperature > 0.7, temperature < 0.3],
+        [4, 1, 3, 2],
+        default=0
+    ).astype(np.uint8)
+
+
+def _union(rect, other):
+    """Bounding box of two (x0, y0, x1, y1) rectangles (rect may be None)"""
+    if rect is None:
+        return other
+    return (min(rect[0], other[0]), min(rect[1], other[1]),
+            max(rect[2], other[2]), max(rect[3], other[3]))
+
+
+def _timed(func, *args):
+    """Run func(*args) and return the seconds it took"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _update_overlays(overlays):
+    """Update a group of overlays in order"""
+    for overlay in overlays:
+        if overlay.active:
+            overlay.update()
 
 
 class World:
     """Represents the game world with all its systems"""
     
-    def __init__(self, width=200, height=200, seed=42):
+    def __init__(self, width=200, height=200, seed=42, workers=None, cache=None, threads=None,
+                 domains=None):
         """
         Initialize the world
         
@@ -15,42 +76,243 @@ class World:
             width: World width
             height: World height
             seed: Random seed for procedural generation
+            workers: Worker processes for field generation (None or 1 = serial)
+            cache: FieldCache for generated noise fields (None = no caching)
+            threads: Threads for update() (None or 1 = serial, 0 = one per core)
+            domains: Worker processes that each simulate a strip of the
+                energy fields (None or 1 = in this process); call close()
+                when done with the world
         """
         self.width = width
         self.height = height
         self.seed = seed
         
+        # Optional thread pool for update(); the NumPy kernels release the GIL
+        if threads == 0:
+            threads = os.cpu_count() or 1
+        self.threads = threads if threads is not None and threads > 1 else 1
+        self._executor = ThreadPoolExecutor(self.threads) if self.threads > 1 else None
+        # Per-subsystem {"wall": s, "busy": s} for the last update
+        self.timings = {}
+        
         # Noise fields for base properties
-        self.terrain = NoiseField(width, height, seed=seed, scale=0.05, octaves=6)
-        self.population = NoiseField(width, height, seed=seed+1, scale=0.1, octaves=4)
-        self.temperature = NoiseField(width, height, seed=seed+2, scale=0.08, octaves=5)
-        
-        # Energy fields
-        self.energy_fields = {
-            "heat": EnergyField(width, height, "heat", decay_rate=0.02),
-            "cold": EnergyField(width, height, "cold", decay_rate=0.02),
-            "magic": EnergyField(width, height, "magic", decay_rate=0.01),
-            "electricity": EnergyField(width, height, "electricity", decay_rate=0.05)
+        field_params = [
+            dict(width=width, height=height, seed=seed, scale=0.05, octaves=6),
+            dict(width=width, height=height, seed=seed+1, scale=0.1, octaves=4),
+            dict(width=width, height=height, seed=seed+2, scale=0.08, octaves=5),
+        ]
+        if workers is not None and workers > 1:
+            fields = generate_fields(field_params, workers=workers, cache=cache)
+        else:
+            fields = [NoiseField(cache=cache, **params) for params in field_params]
+        self.terrain, self.population, self.temperature = fields
+        
+        # Energy fields, simulated together as channels of one array
+        decay_rates = {
+            "heat": 0.02,
+            "cold": 0.02,
+            "magic": 0.01,
+            "electricity": 0.05
         }
+        if domains is not None and domains > 1:
+            self.energy = DistributedEnergyStack(width, height, decay_rates, workers=domains)
+        else:
+            self.energy = EnergyStack(width, height, decay_rates)
+        self.energy_fields = self.energy.fields
+        
+        # How energy types interact where they meet, applied every update
+        self.reactions = [
+            Reaction("annihilate", "heat", "cold", rate=0.1),
+            Reaction("amplify", "electricity", "magic", rate=0.05, efficiency=1.5),
+        ]
+        self.reaction_losses = {}  # Energy lost per reaction in the last update
+        
+        # Spell effects cast this tick, applied together at the next update
+        self.cast_queue = CastQueue()
+        
+        # Evocation state of every caster created with Player(casters=world.casters)
+        self.casters = EvocationEngine()
         
         # Overlays for modifications
         self.overlays = []
+        
+        # Composited terrain (terrain + overlays), kept up to date
+        # incrementally, and its pyramid
+        self._composite = None
+        self._composite_dirty = None  # Pending (x0, y0, x1, y1) to recompute
+        self._terrain_mipmap = None
+        self._composite_lock = threading.Lock()  # Overlays may update in parallel
+        self.terrain.change_listeners.append(self.invalidate_terrain)
+        
+        # Biome index layer over the composited terrain, with one boolean
+        # mask per biome as a reverse index
+        self._biomes = None
+        self._biome_masks = None
+        self._biomes_dirty = None  # Pending (x0, y0, x1, y1) to reclassify
+        self.temperature.change_listeners.append(self.invalidate_biomes)
+    
+    def close(self):
+        """Shut down the update thread pool and energy workers, if any"""
+        if isinstance(self.energy, DistributedEnergyStack):
+            self.energy.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self.threads = 1
     
     def add_overlay(self, overlay):
         """Add a new overlay to the world"""
         self.overlays.append(overlay)
+        overlay.change_listeners.append(self.invalidate_terrain)
+        self.invalidate_terrain()
+    
+    def remove_overlay(self, overlay):
+        """Remove an overlay from the world"""
+        if overlay in self.overlays:
+            self.overlays.remove(overlay)
+            overlay.change_listeners.remove(self.invalidate_terrain)
+            self.invalidate_terrain()
+    
+    def invalidate_terrain(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Record that the composited terrain changed in a region
+        
+        Terrain and overlay edits report themselves through their
+        mark_dirty hooks. Call this (or terrain.mark_dirty) after writing
+        to terrain.data directly.
+        
+        Args:
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        rect = self._clip_rect(x0, y0, x1, y1)
+        if rect is None:
+            return
+        with self._composite_lock:
+            self._composite_dirty = _union(self._composite_dirty, rect)
+            self._biomes_dirty = _union(self._biomes_dirty, rect)
+            if self._terrain_mipmap is not None:
+                self._terrain_mipmap.invalidate(*rect)
+    
+    def invalidate_biomes(self, x0=0, y0=0, x1=None, y1=None):
+        """
+        Record that the biome map changed in a region
+        
+        Terrain, overlay and temperature edits report themselves; call this
+        after writing to temperature.data directly.
+        
+        Args:
+            x0, y0: Top-left corner (inclusive)
+            x1, y1: Bottom-right corner (exclusive); None means the edge
+        """
+        rect = self._clip_rect(x0, y0, x1, y1)
+        if rect is None:
+            return
+        with self._composite_lock:
+            self._biomes_dirty = _union(self._biomes_dirty, rect)
+    
+    def _clip_rect(self, x0, y0, x1, y1):
+        """Clip a rectangle to the world; None if it is empty"""
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1 = self.width if x1 is None else min(int(x1), self.width)
+        y1 = self.height if y1 is None else min(int(y1), self.height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+    
+    def composited_terrain(self):
+        """
+        Terrain with all active overlays applied, as a full array
+        
+        Only the region invalidated since the last call is recomputed.
+        """
+        if self._composite is None:
+            self._composite = np.empty((self.height, self.width))
+            self._composite_dirty = (0, 0, self.width, self.height)
+        if self._composite_dirty is not None:
+            x0, y0, x1, y1 = self._composite_dirty
+            base = self.terrain.data[y0:y1, x0:x1]
+            result = base
+            for overlay in self.overlays:
+                if overlay.active:
+                    result = (result + overlay.combine_region(base, x0, y0, x1, y1)) / 2
+            self._composite[y0:y1, x0:x1] = result
+            self._composite_dirty = None
+        return self._composite
+    
+    def biome_map(self):
+        """
+        Biome of every cell, as a uint8 array of indices into BIOMES
+        
+        Classified in one vectorized pass; only the region invalidated
+        since the last call is reclassified.
+        """
+        composite = self.composited_terrain()
+        if self._biomes is None:
+            self._biomes = np.empty((self.height, self.width), dtype=np.uint8)
+            self._biome_masks = np.empty((len(BIOMES), self.height, self.width), dtype=bool)
+            self._biomes_dirty = (0, 0, self.width, self.height)
+        if self._biomes_dirty is not None:
+            x0, y0, x1, y1 = self._biomes_dirty
+            region = classify_biomes(composite[y0:y1, x0:x1], self.temperature.data[y0:y1, x0:x1])
+            self._biomes[y0:y1, x0:x1] = region
+            indices = np.arange(len(BIOMES), dtype=np.uint8)[:, np.newaxis, np.newaxis]
+            np.equal(region, indices, out=self._biome_masks[:, y0:y1, x0:x1])
+            self._biomes_dirty = None
+        return self._biomes
+    
+    def biome_mask(self, biome):
+        """
+        Boolean map of the cells in one biome (the biome's reverse index)
+        
+        Args:
+            biome: Biome name, one of BIOMES
+        """
+        if biome not in BIOMES:
+            raise ValueError(f"Unknown biome: {biome}")
+        self.biome_map()
+        return self._biome_masks[BIOMES.index(biome)]
+    
+    def find_biome(self, biome, x, y, radius):
+        """
+        Find the cells of a biome near a position
+        
+        Only the window around the position is scanned.
+        
+        Args:
+            biome: Biome name, one of BIOMES
+            x, y: Centre position
+            radius: Search radius in cells
+            
+        Returns:
+            (xs, ys) integer arrays of matching cells, nearest first
+        """
+        mask = self.biome_mask(biome)
+        x0, y0 = max(int(np.floor(x - radius)), 0), max(int(np.floor(y - radius)), 0)
+        x1 = min(int(np.ceil(x + radius)) + 1, self.width)
+        y1 = min(int(np.ceil(y + radius)) + 1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        ys, xs = np.nonzero(mask[y0:y1, x0:x1])
+        xs += x0
+        ys += y0
+        distance = (xs - x) ** 2 + (ys - y) ** 2
+        inside = distance <= radius ** 2
+        order = np.argsort(distance[inside], kind="stable")
+        return xs[inside][order], ys[inside][order]
+    
+    @property
+    def terrain_mipmap(self):
+        """Level-of-detail pyramid over the composited terrain"""
+        if self._terrain_mipmap is None:
+            self._terrain_mipmap = MipPyramid(self.composited_terrain)
+        return self._terrain_mipmap
     
     def get_terrain_value(self, x, y):
         """Get terrain value with overlays applied"""
-        base = self.terrain.get_value(x, y)
-        # Apply all active overlays
-        result = base
-        for overlay in self.overlays:
-            if overlay.active:
-                combined = overlay.combine_with_field(self.terrain)
-                # Blend the overlay effect
-                result = (result + combined[int(y), int(x)]) / 2
-        return result
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return self.terrain.get_value(x, y)
+        return self.composited_terrain()[int(y), int(x)]
     
     def get_energy_value(self, x, y, energy_type):
         """Get energy value at a position"""
@@ -58,38 +320,110 @@ class World:
             return self.energy_fields[energy_type].get_value(x, y)
         return 0
     
+    def sample_terrain(self, xs, ys, mode="nearest"):
+        """
+        Get terrain values with overlays applied at many positions at once
+        
+        Args:
+            xs, ys: Position arrays
+            mode: "nearest" (same as get_terrain_value) or "bilinear"
+            
+        Returns:
+            Array of terrain values; out-of-bounds positions read as 0.5
+        """
+        return sample_array(self.composited_terrain(), xs, ys, mode, default=0.5)
+    
+    def sample_energy(self, xs, ys, energy_type, mode="nearest"):
+        """
+        Get energy values at many positions at once
+        
+        Args:
+            xs, ys: Position arrays
+            energy_type: Energy field to read
+            mode: "nearest" (same as get_energy_value) or "bilinear"
+            
+        Returns:
+            Array of energy values (zeros for an unknown energy type)
+        """
+        if energy_type in self.energy_fields:
+            return self.energy_fields[energy_type].sample(xs, ys, mode)
+        return np.zeros(np.broadcast(np.asarray(xs), np.asarray(ys)).shape, dtype=np.float32)
+    
+    def sample_biomes(self, xs, ys):
+        """
+        Determine biomes at many positions at once
+        
+        Args:
+            xs, ys: Position arrays
+            
+        Returns:
+            Array of biome names, as returned by get_biome
+        """
+        indices = classify_biomes(self.sample_terrain(xs, ys), self.temperature.sample(xs, ys))
+        return np.array(BIOMES)[indices]
+    
     def update(self, dt):
         """
         Update world state
         
+        Spells queued in self.cast_queue and evocations of self.casters are
+        applied first. With a thread pool, each energy type and each group
+        of overlays is then updated as its own task; they touch disjoint
+        data, so the result is the same as a serial update. Timings for each subsystem are kept in
+        self.timings: "wall" is elapsed time and "busy" the summed task
+        time, so busy / wall is the parallel speedup.
+        
         Args:
             dt: Delta time in seconds
         """
+        timings = {}
+        
+        # Apply the spells cast since the last update
+        start = time.perf_counter()
+        self.cast_queue.flush()
+        elapsed = time.perf_counter() - start
+        timings["casts"] = {"wall": elapsed, "busy": elapsed}
+        
+        # Push and pull energy for every evoking caster at once
+        start = time.perf_counter()
+        self.casters.update(self.energy_fields, dt)
+        elapsed = time.perf_counter() - start
+        timings["evocation"] = {"wall": elapsed, "busy": elapsed}
+        
         # Update energy fields
-        for energy_field in self.energy_fields.values():
-            energy_field.update()
+        start = time.perf_counter()
+        if self._executor is None or isinstance(self.energy, DistributedEnergyStack):
+            busy = _timed(self.energy.update, dt)
+        else:
+            fields = list(self.energy_fields.values())
+            busy = sum(self._executor.map(_timed, [f.update for f in fields], [dt] * len(fields)))
+        timings["energy"] = {"wall": time.perf_counter() - start, "busy": busy}
+        
+        # Let them react (needs every energy type at once)
+        start = time.perf_counter()
+        self.reaction_losses = self.energy.react(self.reactions, dt)
+        elapsed = time.perf_counter() - start
+        timings["reactions"] = {"wall": elapsed, "busy": elapsed}
         
         # Update overlays
-        for overlay in self.overlays:
-            if overlay.active:
-                overlay.update()
+        start = time.perf_counter()
+        if self._executor is None:
+            busy = _timed(_update_overlays, self.overlays)
+        else:
+            groups = [self.overlays[i::self.threads] for i in range(self.threads)]
+            busy = sum(self._executor.map(_timed, [_update_overlays] * len(groups), groups))
+        timings["overlays"] = {"wall": time.perf_counter() - start, "busy": busy}
         
-        # Remove inactive overlays
-        self.overlays = [o for o in self.overlays if o.active]
+        # Remove inactive overlays (in list order, so the result is deterministic)
+        start = time.perf_counter()
+        for overlay in [o for o in self.overlays if not o.active]:
+            self.remove_overlay(overlay)
+        elapsed = time.perf_counter() - start
+        timings["prune"] = {"wall": elapsed, "busy": elapsed}
+        self.timings = timings
     
     def get_biome(self, x, y):
         """Determine biome based on terrain and temperature"""
         terrain = self.get_terrain_value(x, y)
         temp = self.temperature.get_value(x, y)
-        
-        # Simple biome classification
-        if terrain > 0.7:
-            return "mountain"
-        elif terrain < 0.3:
-            return "water"
-        elif temp > 0.7:
-            return "desert"
-        elif temp < 0.3:
-            return "tundra"
-        else:
-            return "plains"
+        return BIOMES[classify_biomes(terrain, temp)]
@@ -26,7 +26,7 @@ def main():
     
     # Create player
     print("\n2. Creating player character...")
-    player = Player(x=50, y=50)
+    player = Player(x=50, y=50, casters=world.casters)
     print(f"   ✓ Player position: ({player.x}, {player.y})")
     print(f"   ✓ Magic reserve: {player.stats.current_magic_reserve}/{player.stats.max_magic_reserve}")
     print(f"   ✓ Stats: WIL={player.stats.willpower}, WIS={player.stats.wisdom}, INT={player.stats.intelligence}, DEX={player.stats.dexterity}")
@@ -47,7 +47,8 @@ def main():
     initial_heat = heat_field.get_value(60, 60)
     
     for i in range(10):
-        player.update(world, 0.1)  # 100ms per frame
+        world.update(0.1)  # 100ms per frame; steps the world's casters
+        player.update(world, 0.1)
     
     final_heat = heat_field.get_value(60, 60)
     print(f"   ✓ Heat at target: {initial_heat:.2f} → {final_heat:.2f}")
@@ -155,7 +156,7 @@ def main():
     print("\n   Run the game with: python -m game.main")
     print("   See HOWTO.md for controls and gameplay guide")
     print("   See IMPLEMENTATION.md for technical details")
-    
+
 
 if __name__ == "__main__":
     main()
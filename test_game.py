@@ -16,6 +16,123 @@ def test_noise_generation():
     print("✓ Noise generation working")
     return True
 
+def test_noise_engines():
+    """Test the vectorized noise engine against pnoise2"""
+    print("\n=== Testing Noise Engines ===")
+    import numpy as np
+    from game.core.noise_field import NoiseField
+    from game.core.perlin import PNOISE_BASES, matches_pnoise, pnoise2_grid
+    
+    for seed in (0, 42, 44):
+        fast = NoiseField(40, 30, seed=seed, scale=0.05, octaves=6)
+        slow = NoiseField(40, 30, seed=seed, scale=0.05, octaves=6, engine="pnoise")
+        assert np.array_equal(fast.data, slow.data), f"Engines differ for seed {seed}"
+    print("✓ NumPy engine matches pnoise2")
+    
+    # Large and negative seeds, including the ends of the verified range
+    for seed in (PNOISE_BASES[-1], PNOISE_BASES[-1] + 1, 1000, 12345, 12347, -1, -5):
+        fast = NoiseField(40, 30, seed=seed, scale=0.05, octaves=6)
+        slow = NoiseField(40, 30, seed=seed, scale=0.05, octaves=6, engine="pnoise")
+        assert np.array_equal(fast.data, slow.data), f"Engines differ for seed {seed}"
+    print("✓ Engines agree for large and negative seeds")
+    
+    # The default world seed must use the vectorized port, not the fallback
+    from noise import pnoise2
+    assert matches_pnoise(42) and not matches_pnoise(-5)
+    xs, ys = np.arange(0, 300, 1.3), np.arange(0, 300, 7.1)
+    expected = [[pnoise2(float(x), float(y), octaves=4, base=42) for x in np.float32(xs)]
+                for y in np.float32(ys)]
+    assert np.array_equal(pnoise2_grid(xs, ys, octaves=4, base=42),
+                          np.array(expected, dtype=np.float32))
+    print("✓ Vectorized port matches pnoise2 for seed 42")
+    return True
+
+def test_chunked_noise_field():
+    """Test lazily generated chunked noise fields"""
+    print("\n=== Testing Chunked Noise Field ===")
+    import numpy as np
+    from game.core.noise_field import NoiseField
+    from game.core.chunked_field import ChunkedNoiseField
+    
+    dense = NoiseField(100, 80, seed=42, scale=0.05)
+    # Budget of two chunks forces evictions while reading
+    chunked = ChunkedNoiseField(100, 80, seed=42, scale=0.05, chunk_size=32,
+                                max_bytes=2 * 32 * 32 * 8)
+    assert chunked.memory_usage() == 0
+    assert np.array_equal(chunked.data, dense.data)
+    assert chunked.get_value(70, 10) == dense.get_value(70, 10)
+    assert chunked.memory_usage() <= chunked.max_bytes
+    print("✓ Chunks generate lazily and match the dense field")
+    
+    chunked.set_value(5, 5, 0.25)
+    chunked.get_region(40, 40, 60, 40)  # Evicts the modified chunk
+    assert (0, 0) in chunked.store
+    assert chunked.get_value(5, 5) == 0.25
+    print("✓ Modified chunks survive eviction")
+    
+    infinite = ChunkedNoiseField(seed=7, chunk_size=16)
+    assert 0 <= infinite.get_value(-1000, 5000) <= 1
+    print("✓ Unbounded fields working")
+    return True
+
+def test_parallel_generation():
+    """Test multi-process field generation"""
+    print("\n=== Testing Parallel Generation ===")
+    import numpy as np
+    from game.world.world import World
+    
+    serial = World(90, 70, seed=42)
+    parallel = World(90, 70, seed=42, workers=2)
+    for name in ("terrain", "population", "temperature"):
+        assert np.array_equal(getattr(serial, name).data, getattr(parallel, name).data)
+    print("✓ Parallel generation is bit-identical to serial")
+    return True
+
+def test_field_cache():
+    """Test the on-disk noise field cache"""
+    print("\n=== Testing Field Cache ===")
+    import tempfile
+    import numpy as np
+    from game.core import parallel as parallel_module
+    from game.core.field_cache import FieldCache, field_key, main as cache_cli
+    from game.core.noise_field import NoiseField
+    from game.world.world import World
+    
+    with tempfile.TemporaryDirectory() as directory:
+        cache = FieldCache(directory)
+        fresh = World(60, 40, seed=42, cache=cache)
+        assert len(cache._entries()) == 3
+        cached = World(60, 40, seed=42, cache=cache)
+        assert isinstance(cached.terrain.data, np.memmap)
+        assert np.array_equal(fresh.terrain.data, cached.terrain.data)
+        cached.terrain.set_value(1, 1, 0.0)  # Copy-on-write, cache untouched
+        assert np.array_equal(World(60, 40, seed=42, cache=cache).terrain.data,
+                              fresh.terrain.data)
+        print("✓ Cached fields load memory-mapped")
+        
+        parallel = World(60, 40, seed=43, workers=2, cache=cache)
+        assert len(cache._entries()) == 6
+        assert np.array_equal(World(60, 40, seed=43).terrain.data, parallel.terrain.data)
+        # Fully cached: no process pool is started
+        pool, parallel_module.ProcessPoolExecutor = parallel_module.ProcessPoolExecutor, None
+        try:
+            reloaded = World(60, 40, seed=43, workers=2, cache=cache)
+        finally:
+            parallel_module.ProcessPoolExecutor = pool
+        assert np.array_equal(reloaded.terrain.data, parallel.terrain.data)
+        
+        params = dict(width=60, height=40, seed=43, scale=0.05)
+        assert field_key(**params) == NoiseField(**params).cache_key()
+        assert field_key(**params) != field_key(engine="pnoise", **params)
+        print("✓ Cache keys carry the engine")
+        
+        cache_cli(["--dir", directory, "prune", "--max-mb", "0.03"])
+        assert cache.size() <= 0.03 * 1024 * 1024
+        cache_cli(["--dir", directory, "clear"])
+        assert cache.size() == 0
+        print("✓ Cache pruning working")
+    return True
+
 def test_overlay_system():
     """Test overlay system"""
     print("\n=== Testing Overlay System ===")
@@ -32,6 +149,123 @@ def test_overlay_system():
     print("✓ Overlay system working")
     return True
 
+def test_sparse_overlays():
+    """Test bounding-box overlays against dense ones"""
+    print("\n=== Testing Sparse Overlays ===")
+    import numpy as np
+    from game.core.overlay import Overlay
+    from game.world.world import World
+    
+    dense, sparse = Overlay(80, 60, decay_rate=0.05), Overlay(80, 60, decay_rate=0.05, sparse=True)
+    for overlay in (dense, sparse):
+        overlay.apply_effect(10, 10, radius=4, intensity=0.3)
+        overlay.apply_effect(40, 30, radius=6, intensity=-0.2)
+    assert sparse.bbox == (6, 6, 47, 37)
+    assert sparse._values.nbytes < dense.data.nbytes / 2
+    assert np.array_equal(sparse.data, dense.data)
+    
+    expected = dense.data.copy()
+    dense.update()
+    sparse.update()
+    expected = (expected - 0.5) * (1 - 0.05) + 0.5
+    assert np.array_equal(dense.data, expected)
+    assert np.array_equal(sparse.data, dense.data)
+    print("✓ Sparse overlays store, stamp and decay only their bounding box")
+    
+    worlds = [World(80, 60, seed=42), World(80, 60, seed=42)]
+    for world, overlay in zip(worlds, (dense, sparse)):
+        world.add_overlay(overlay)
+    assert np.array_equal(worlds[0].composited_terrain(), worlds[1].composited_terrain())
+    assert np.array_equal(sparse.combine_with_field(worlds[0].terrain),
+                          dense.combine_with_field(worlds[0].terrain))
+    for _ in range(80):
+        for world in worlds:
+            world.update(0.1)
+    assert not worlds[0].overlays and not worlds[1].overlays
+    print("✓ World composites sparse and dense overlays identically")
+    return True
+
+def test_stamp_kernels():
+    """Test precomputed stamp kernels"""
+    print("\n=== Testing Stamp Kernels ===")
+    import numpy as np
+    from game.core.stamp import radial_kernel, stamp_add
+    from game.core.energy import EnergyField
+    
+    weights, mask = radial_kernel(5)
+    assert radial_kernel(5)[0] is weights, "Kernels should be cached"
+    assert weights.shape == (11, 11) and weights[5, 5] == 1.0
+    assert weights[0, 0] == 0 and not mask[0, 0]
+    
+    field = EnergyField(20, 20)
+    field.add_energy(0, 19, 100, radius=5)  # Corner stamp, mostly off the map
+    assert field.get_value(0, 19) == 100
+    assert np.isclose(field.get_value(3, 19), 100 * (1 - 3 / 5))
+    assert field.data[:13, :].sum() == 0
+    assert stamp_add(field.data, -20, -20, 5, 1.0) is None
+    print("✓ Stamps clip at map edges")
+    return True
+
+def test_mipmaps():
+    """Test level-of-detail pyramids"""
+    print("\n=== Testing Mipmaps ===")
+    import numpy as np
+    from game.core.noise_field import NoiseField
+    from game.core.energy import EnergyField
+    from game.core.overlay import Overlay
+    from game.core.chunked_field import ChunkedNoiseField
+    from game.world.world import World
+    
+    def reduce(a):
+        a = np.pad(a, ((0, a.shape[0] % 2), (0, a.shape[1] % 2)), mode="edge")
+        return a.reshape(a.shape[0] // 2, 2, a.shape[1] // 2, 2).mean(axis=(1, 3))
+    
+    field = NoiseField(51, 40, seed=3)
+    assert field.mipmap.level(1).shape == (20, 26)
+    assert field.mipmap.level(6).shape == (1, 1)
+    field.set_value(10, 10, 1.0)
+    assert np.allclose(field.mipmap.level(2), reduce(reduce(field.data)))
+    print("✓ Noise field pyramid updates after set_value")
+    
+    energy = EnergyField(40, 40)
+    energy.mipmap.level(3)
+    energy.add_energy(20, 20, 100, radius=4)
+    assert np.allclose(energy.mipmap.level(3), reduce(reduce(reduce(energy.data))))
+    energy.update()
+    assert np.allclose(energy.mipmap.level(1), reduce(energy.data))
+    print("✓ Energy field pyramid updates after add_energy")
+    
+    world = World(64, 64, seed=1)
+    coarse = world.terrain_mipmap.level(2).copy()
+    overlay = Overlay(64, 64)
+    world.add_overlay(overlay)
+    overlay.apply_effect(32, 32, radius=6, intensity=0.4)
+    composite = world.composited_terrain()
+    assert np.allclose(world.terrain_mipmap.level(2), reduce(reduce(composite)))
+    assert not np.allclose(world.terrain_mipmap.level(2), coarse)
+    print("✓ Composited terrain pyramid follows overlays")
+    
+    for storage in ("float32", "uint8"):
+        sparse = Overlay(150, 90, sparse=True, storage=storage)
+        assert sparse.mipmap.level(3).shape == (12, 19)
+        sparse.apply_effect(100, 40, radius=8, intensity=0.4)
+        assert np.allclose(sparse.mipmap.level(2), reduce(reduce(sparse.data)))
+        sparse.update()
+        sparse.apply_effect(20, 70, radius=5, intensity=-0.3)
+        assert np.allclose(sparse.mipmap.level(3), reduce(reduce(reduce(sparse.data))))
+        assert np.allclose(sparse.mipmap.view(0, 0, 64, 32, 4), 0.5)
+    print("✓ Sparse and quantized overlay pyramids read the stored values")
+    
+    chunked = ChunkedNoiseField(100, 70, seed=3, chunk_size=16)
+    chunked.mipmap.level(2)
+    chunked.set_value(40, 30, 1.0)
+    assert np.allclose(chunked.mipmap.level(3), reduce(reduce(reduce(chunked.data))))
+    unbounded = ChunkedNoiseField(seed=3, chunk_size=16)
+    view = unbounded.mipmap.view(-40, -24, 80, 48, 2)
+    assert np.allclose(view, reduce(reduce(unbounded.get_region(-40, -24, 80, 48))))
+    print("✓ Chunked field pyramid is built from chunks, unbounded too")
+    return True
+
 def test_energy_system():
     """Test energy system"""
     print("\n=== Testing Energy System ===")
@@ -56,6 +290,696 @@ def test_energy_system():
     print("✓ Energy fields working")
     return True
 
+def test_energy_diffusion():
+    """Test the vectorized diffusion step against the reference loop"""
+    print("\n=== Testing Energy Diffusion ===")
+    import numpy as np
+    from game.core.energy import EnergyField
+    
+    field = EnergyField(30, 20, decay_rate=0.02)
+    field.add_energy(0, 10, 80, radius=6)
+    field.add_energy(15, 10, 50, radius=4)
+    expected = field.data.copy()
+    buffer = field.data
+    for _ in range(3):
+        expected *= (1 - 0.02)
+        diffused = np.copy(expected)
+        for y in range(1, 19):
+            for x in range(1, 29):
+                neighbors = (expected[y-1, x] + expected[y+1, x] +
+                             expected[y, x-1] + expected[y, x+1]) / 4
+                diffused[y, x] = expected[y, x] * 0.8 + neighbors * 0.2
+        expected = diffused
+        field.update()
+    assert np.array_equal(field.data, expected)
+    assert field.data is buffer, "Update should run in place"
+    print("✓ Vectorized diffusion matches the reference loop")
+    return True
+
+def test_energy_stack():
+    """Test that stacked energy channels match independent fields"""
+    print("\n=== Testing Energy Stack ===")
+    import numpy as np
+    from game.core.energy import EnergyField, EnergyStack
+    
+    rates = {"heat": 0.02, "magic": 0.01, "electricity": 0.05}
+    stack = EnergyStack(30, 20, rates)
+    separate = {t: EnergyField(30, 20, t, decay_rate=r) for t, r in rates.items()}
+    for i, energy_type in enumerate(rates):
+        stack.fields[energy_type].add_energy(5 + 8 * i, 10, 60, radius=4)
+        separate[energy_type].add_energy(5 + 8 * i, 10, 60, radius=4)
+    assert np.shares_memory(stack.fields["magic"].data, stack.data)
+    assert stack.channel("magic") == 1
+    print("✓ Channels are views into one array")
+    
+    for _ in range(5):
+        stack.update()
+        for field in separate.values():
+            field.update()
+    for energy_type in rates:
+        assert np.array_equal(stack.fields[energy_type].data, separate[energy_type].data)
+    print("✓ Stacked update matches per-field updates")
+    return True
+
+def test_sleeping_tiles():
+    """Test that only active energy tiles are simulated"""
+    print("\n=== Testing Sleeping Tiles ===")
+    import numpy as np
+    from game.core.energy import EnergyField
+    
+    field = EnergyField(64, 48, decay_rate=0.02, tile_size=8, sleep_threshold=0)
+    assert not field.awake.any()
+    field.update()
+    print("✓ Empty field has no awake tiles")
+    
+    field.add_energy(10, 10, 80, radius=3)
+    reference = EnergyField(64, 48, decay_rate=0.02, data=field.data.copy(),
+                            sleep_threshold=0)
+    assert field.awake_fraction < 0.1
+    for _ in range(20):
+        field.update()
+        reference.update()
+    assert np.array_equal(field.data, reference.data)
+    assert 0 < field.awake_fraction < 1
+    print("✓ Awake-tile update matches a full update")
+    
+    field.sleep_threshold = 1.0
+    for _ in range(300):
+        field.update()
+    assert not field.awake.any() and not field.data.any()
+    print("✓ Quiet tiles fall asleep and are zeroed")
+    return True
+
+def test_energy_time_steps():
+    """Test the dt-aware energy integrator"""
+    print("\n=== Testing Energy Time Steps ===")
+    import numpy as np
+    from game.core.energy import EnergyField, REFERENCE_DT
+    
+    classic = EnergyField(60, 50, sleep_threshold=0)
+    classic.add_energy(30, 25, 100, radius=5)
+    stepped = EnergyField(60, 50, sleep_threshold=0, data=classic.data.copy())
+    large = EnergyField(60, 50, sleep_threshold=0, data=classic.data.copy())
+    classic.update()
+    stepped.update(REFERENCE_DT)
+    assert np.array_equal(classic.data, stepped.data)
+    print("✓ Reference dt matches the classic update")
+    
+    for _ in range(19):
+        stepped.update(REFERENCE_DT)
+    large.update(20 * REFERENCE_DT)
+    assert np.allclose(large.data, stepped.data, atol=1e-3)
+    print("✓ One large step matches many reference steps")
+    
+    # Energy next to the map edge, where the border ring feeds the interior
+    edge = EnergyField(60, 50, sleep_threshold=0)
+    edge.add_energy(1, 25, 100, radius=5)
+    edge_large = EnergyField(60, 50, sleep_threshold=0, data=edge.data.copy())
+    for _ in range(20):
+        edge.update(REFERENCE_DT)
+    edge_large.update(20 * REFERENCE_DT)
+    assert np.allclose(edge_large.data, edge.data, atol=1e-3)
+    print("✓ Large steps are exact next to the border")
+    
+    whole = EnergyField(60, 50, sleep_threshold=0, data=classic.data.copy())
+    twice = EnergyField(60, 50, sleep_threshold=0, data=classic.data.copy())
+    whole.update(2 * REFERENCE_DT)
+    twice.update()
+    twice.update()
+    assert np.array_equal(whole.data, twice.data)
+    print("✓ Whole multiples of the reference dt repeat the classic update")
+    
+    # A jittered dt just over the reference step stays on the stencil and
+    # leaves sleeping tiles alone
+    jittered = EnergyField(256, 256)
+    jittered.add_energy(128, 128, 100, radius=5)
+    jittered.update(REFERENCE_DT * 1.001)
+    assert 0 < jittered.awake_fraction < 0.5
+    assert jittered.data[:64, :64].max() == 0
+    print("✓ Slightly long steps keep sleeping tiles asleep")
+    
+    large.update(1e6)
+    assert np.isfinite(large.data).all() and np.abs(large.data).max() < 1e-3
+    print("✓ Huge steps stay stable")
+    
+    for width, height in ((1, 12), (12, 1)):
+        thin = EnergyField(width, height)
+        thin.add_energy(0, 0, 10, radius=2)
+        thin.update()
+        thin.update(5 * REFERENCE_DT)
+        assert np.isfinite(thin.data).all()
+    print("✓ One-cell-wide fields update")
+    return True
+
+def test_energy_network():
+    """Test the array-backed energy node network"""
+    print("\n=== Testing Energy Network ===")
+    import numpy as np
+    from game.core.energy import EnergyNode
+    from game.core.energy_network import EnergyNetwork
+    
+    # Handles behave like EnergyNode
+    network = EnergyNetwork()
+    source = network.add_node(capacity=100, current=80)
+    sink = network.add_node(capacity=100, current=20)
+    source.connect(sink)
+    source.connect(sink)
+    assert network.num_edges == 1 and source.connections == [sink]
+    reference_source = EnergyNode(capacity=100, current=80)
+    reference_sink = EnergyNode(capacity=100, current=20)
+    assert source.flow_to(sink) == reference_source.flow_to(reference_sink)
+    assert (source.current, sink.current) == (reference_source.current, reference_sink.current)
+    print("✓ Node handles match EnergyNode")
+    
+    # One vectorized step over every edge
+    network = EnergyNetwork()
+    hub = network.add_node(capacity=100, current=90)
+    spokes = network.add_nodes(np.full(5, 10.0), 0)
+    network.connect_many(np.full(5, hub.index), spokes)
+    indptr, indices = network.csr
+    assert len(indptr) == network.size + 1 and len(indices) == 5
+    assert list(network.neighbors(hub.index)) == list(spokes)
+    total = network.total_energy()
+    network.flow()
+    assert hub.current == 0, "Outflows should be clamped to what the source holds"
+    assert np.all(network.current[spokes] == 10), "Targets should be capped at capacity"
+    assert network.total_energy() <= total
+    print("✓ Vectorized flow clamps to zero and capacity")
+    return True
+
+def test_energy_reactions():
+    """Test the cross-energy reaction table"""
+    print("\n=== Testing Energy Reactions ===")
+    import numpy as np
+    from game.core.energy import EnergyStack
+    from game.core.reactions import Reaction
+    
+    stack = EnergyStack(40, 30, {"heat": 0.02, "cold": 0.02, "magic": 0.01})
+    stack.fields["heat"].add_energy(10, 15, 50, radius=4)
+    stack.fields["cold"].add_energy(12, 15, 30, radius=4)
+    stack.fields["magic"].add_energy(30, 15, 40, radius=3)
+    magic_before = stack.fields["magic"].data.copy()
+    total = stack.data.sum(dtype=np.float64)
+    
+    reactions = [Reaction("annihilate", "heat", "cold", rate=1.0)]
+    losses = stack.react(reactions)
+    assert losses["heat annihilate cold"] > 0
+    assert np.isclose(total - stack.data.sum(dtype=np.float64), losses["heat annihilate cold"])
+    heat, cold = stack.fields["heat"].data, stack.fields["cold"].data
+    assert not np.any((heat > 0) & (cold > 0)), "Full-rate annihilation should leave one energy per cell"
+    assert np.array_equal(stack.fields["magic"].data, magic_before)
+    print("✓ Annihilation conserves energy up to the reported loss")
+    
+    # Two reactions drawing on the same energy never overdraw it
+    stack.fields["cold"].add_energy(30, 15, 40, radius=3)
+    stack.fields["heat"].add_energy(30, 15, 40, radius=3)
+    reactions = [Reaction("amplify", "heat", "magic", rate=1.0, efficiency=2.0),
+                 Reaction("annihilate", "cold", "magic", rate=1.0)]
+    losses = stack.react(reactions)
+    assert stack.data.min() >= 0
+    assert losses["heat amplify magic"] < 0, "Amplification is reported as a gain"
+    print("✓ Shared energies are never overdrawn")
+    return True
+
+def test_threaded_world_update():
+    """Test that a threaded world update matches a serial one"""
+    print("\n=== Testing Threaded World Update ===")
+    import numpy as np
+    from game.world.world import World
+    from game.core.overlay import Overlay
+    
+    worlds = [World(width=80, height=80), World(width=80, height=80, threads=3)]
+    for world in worlds:
+        for i, energy_field in enumerate(world.energy_fields.values()):
+            energy_field.add_energy(15 + 15 * i, 40, 60, radius=5)
+        for i in range(5):
+            overlay = Overlay(80, 80, decay_rate=0.1, sparse=i % 2 == 0)
+            overlay.apply_effect(10 + 15 * i, 20, 6, 0.4)
+            world.add_overlay(overlay)
+        for _ in range(10):
+            world.update(0.1)
+    serial, threaded = worlds
+    assert threaded.threads == 3
+    assert np.array_equal(serial.energy.data, threaded.energy.data)
+    assert np.array_equal(serial.composited_terrain(), threaded.composited_terrain())
+    assert len(serial.overlays) == len(threaded.overlays)
+    print("✓ Threaded update matches serial update")
+    
+    assert set(threaded.timings) == {"casts", "evocation", "energy", "reactions", "overlays", "prune"}
+    assert all(t["wall"] >= 0 and t["busy"] >= 0 for t in threaded.timings.values())
+    threaded.close()
+    print("✓ Per-subsystem timings recorded")
+    return True
+
+def test_domain_decomposition():
+    """Test the multi-process strip simulation against a single process"""
+    print("\n=== Testing Domain Decomposition ===")
+    import numpy as np
+    from game.world.world import World
+    from game.core.domain import DistributedEnergyStack
+    
+    worlds = [World(width=70, height=100), World(width=70, height=100, domains=3)]
+    try:
+        assert isinstance(worlds[1].energy, DistributedEnergyStack)
+        assert len(worlds[1].energy.strips) == 3
+        for world in worlds:
+            world.energy_fields["heat"].add_energy(35, 32, 80, radius=6)  # Across a strip edge
+            world.energy_fields["cold"].add_energy(0, 70, 50, radius=4)
+            for _ in range(8):
+                world.update(0.1)
+        serial, distributed = worlds
+        assert np.array_equal(serial.energy.data, distributed.energy.data)
+        assert np.array_equal(serial.energy.awake, distributed.energy.awake)
+        print("✓ Strips with halo exchange match the single-process update")
+        
+        for world in worlds:
+            world.update(0.25)  # Three stencil substeps
+        assert np.array_equal(serial.energy.data, distributed.energy.data)
+        assert np.array_equal(serial.energy.awake, distributed.energy.awake)
+        print("✓ Substepped ticks match the single-process update")
+        
+        for world in worlds:
+            world.update(0.8)
+        assert np.allclose(serial.energy.data, distributed.energy.data, atol=1e-4)
+        print("✓ Multi-step ticks match to floating-point tolerance")
+    finally:
+        for world in worlds:
+            world.close()
+    return True
+
+def test_lazy_overlay_decay():
+    """Test closed-form overlay decay applied on read"""
+    print("\n=== Testing Lazy Overlay Decay ===")
+    import numpy as np
+    from game.core.overlay import Overlay
+    
+    overlay = Overlay(50, 40, decay_rate=0.1)
+    overlay.apply_effect(25, 20, radius=6, intensity=0.4)
+    start = overlay.data.copy()
+    stored = overlay._values.copy()
+    for _ in range(5):
+        overlay.update()
+    assert np.array_equal(overlay._values, stored), "Updates should not touch the array"
+    assert np.allclose(overlay.data, 0.5 + (start - 0.5) * 0.9 ** 5)
+    print("✓ Decay is applied in closed form when read")
+    
+    expiry = overlay.expiry_tick
+    reference = overlay.data.copy()
+    ticks = overlay.tick
+    while not np.allclose(reference, 0.5, atol=0.01):
+        reference = reference * 0.9 + 0.05
+        ticks += 1
+    assert expiry == ticks
+    while overlay.active:
+        overlay.update()
+    assert overlay.tick == expiry
+    print("✓ Expiry tick is computed analytically")
+    return True
+
+def test_quantized_overlays():
+    """Test uint8/uint16 overlay storage against float32"""
+    print("\n=== Testing Quantized Overlays ===")
+    import numpy as np
+    from game.core.overlay import Overlay, decode_table, encode
+    from game.core.noise_field import NoiseField
+    
+    table = decode_table("uint8")
+    assert table[128] == 0.5 and table[0] == 0.0 and table[255] == 1.0
+    assert np.array_equal(encode([0.5, 1.0, 0.0], "uint8"), [128, 255, 1])
+    print("✓ 128 is neutral gray and 0-1 round-trips")
+    
+    field = NoiseField(60, 50, seed=3)
+    overlays = [Overlay(60, 50, decay_rate=0.05, storage=storage)
+                for storage in ("float32", "uint8", "uint16")]
+    for overlay in overlays:
+        overlay.apply_effect(20, 20, radius=8, intensity=0.4)
+        for _ in range(5):
+            overlay.update()
+        overlay.apply_effect(40, 30, radius=6, intensity=-0.3)
+        overlay.update()
+    reference, uint8, uint16 = overlays
+    assert uint8.memory_usage * 4 == reference.memory_usage
+    assert uint8.texture.dtype == np.uint8 and uint8.texture[0, 0] == 128
+    assert np.abs(uint8.data - reference.data).max() < 2 / 255
+    assert np.abs(uint16.data - reference.data).max() < 1e-4
+    assert np.allclose(uint8.combine_with_field(field), reference.combine_with_field(field),
+                       atol=0.01)
+    assert uint8.expiry_tick == reference.expiry_tick
+    print("✓ Quantized overlays composite like float32 at a quarter of the memory")
+    return True
+
+def test_biome_map():
+    """Test the cached biome index layer and its reverse index"""
+    print("\n=== Testing Biome Map ===")
+    import numpy as np
+    from game.world.world import World, BIOMES
+    from game.core.overlay import Overlay
+    
+    world = World(70, 50, seed=42)
+    
+    def brute_force():
+        return np.array([[BIOMES.index(world.get_biome(x, y)) for x in range(70)]
+                         for y in range(50)])
+    
+    biomes = world.biome_map()
+    assert biomes.dtype == np.uint8
+    assert np.array_equal(biomes, brute_force())
+    print("✓ Vectorized biome map matches get_biome")
+    
+    overlay = Overlay(70, 50)
+    world.add_overlay(overlay)
+    world.biome_map()
+    overlay.apply_effect(35, 25, radius=10, intensity=-0.5)
+    world.temperature.set_value(3, 3, 0.95)
+    assert world._biomes_dirty == (3, 3, 46, 36)
+    biomes = world.biome_map()
+    assert np.array_equal(biomes, brute_force())
+    print("✓ Only dirty regions are reclassified")
+    
+    for index, biome in enumerate(BIOMES):
+        assert np.array_equal(world.biome_mask(biome), biomes == index)
+    biome = BIOMES[biomes[25, 35]]
+    xs, ys = world.find_biome(biome, 35, 25, radius=12)
+    rows, cols = np.nonzero(biomes == BIOMES.index(biome))
+    near = (cols - 35) ** 2 + (rows - 25) ** 2 <= 144
+    assert set(zip(xs.tolist(), ys.tolist())) == set(zip(cols[near].tolist(), rows[near].tolist()))
+    assert (xs[0], ys[0]) == (35, 25), "Nearest cell should come first"
+    print("✓ Reverse index finds nearby cells of a biome")
+    return True
+
+def test_cast_queue():
+    """Test batched spell casting"""
+    print("\n=== Testing Cast Queue ===")
+    import numpy as np
+    from game.core.energy import EnergyField
+    from game.magic.stats import PlayerStats
+    from game.magic.spells import Spell, Spellbook, CastQueue
+    
+    spells = [Spell("Fireball", "heat", "radius", 5, 50, 0.1),
+              Spell("Spark", "heat", "radius", 2, 20, 0.1),
+              Spell("Siphon", "heat", "drain", 3, 30, 0.1)]
+    book = Spellbook()
+    for spell in spells:
+        book.add_spell(spell)
+    rng = np.random.default_rng(3)
+    casts = [(int(rng.integers(3)), float(rng.uniform(-5, 105)), float(rng.uniform(-5, 85)))
+             for _ in range(200)]
+    
+    direct = EnergyField(100, 80, "heat", tile_size=16)
+    batched = EnergyField(100, 80, "heat", tile_size=16)
+    changes = []
+    batched.change_listeners.append(lambda *rect: changes.append(rect))
+    queue = CastQueue()
+    direct_stats, batched_stats = PlayerStats(), PlayerStats()
+    for index, x, y in casts:
+        book.cast_spell(index, direct_stats, direct, x, y)
+        book.cast_spell(index, batched_stats, batched, x, y, queue)
+    assert batched_stats.current_magic_reserve == direct_stats.current_magic_reserve, \
+        "Magic should be charged at cast time"
+    assert not batched.data.any() and len(queue) == 200, "Queued casts should wait for flush"
+    print("✓ Casts are queued and charged immediately")
+    
+    assert queue.flush() == 200 and len(queue) == 0
+    assert np.array_equal(batched.data, direct.data), "Batched casts should match one-by-one casts"
+    assert np.array_equal(batched.awake, direct.awake)
+    assert len(changes) == 1, "Listeners should be notified once per flush"
+    print("✓ Flush matches applying casts one by one")
+    
+    # The world applies its queue before simulating
+    from game.world.world import World
+    from game.world.player import Player
+    world = World(width=64, height=64, seed=5)
+    player = Player(32, 32)
+    player.spellbook.add_spell(spells[0])
+    assert player.cast_spell(0, world, 20, 20)
+    assert world.get_energy_value(20, 20, "heat") == 0
+    world.update(0.1)
+    assert world.get_energy_value(20, 20, "heat") > 0
+    print("✓ World update applies queued casts")
+    return True
+
+def test_compiled_spells():
+    """Test spells compiled into shared effect kernels"""
+    print("\n=== Testing Compiled Spells ===")
+    import math
+    import numpy as np
+    from game.core.energy import EnergyField
+    from game.magic.stats import PlayerStats
+    from game.core.stamp import directional_kernel, KERNEL_CACHE_SIZE
+    from game.magic.effects import compile_spell
+    from game.magic.spells import Spell, Spellbook, Scroll
+    from game.magic.thaumaturgy import Thaumaturgy
+    
+    stats = PlayerStats()
+    stats.intelligence = 20
+    first = Thaumaturgy(stats).design_spell("Steam", ["heat", "magic"], "radius", 4, 20)
+    second = Thaumaturgy(PlayerStats()).design_spell("Mist", ["heat", "magic"], "radius", 4, 20)
+    assert first.effect is second.effect, "Same designs should share one compiled effect"
+    assert Thaumaturgy(stats).design_spell("Knot", ["heat"], "spiral", 4, 20) is None
+    
+    # Spells of unknown effect types (e.g. from old saves) do nothing and cost nothing
+    wall = Spell.from_dict({"name": "Wall", "energy_type": "heat", "effect_type": "wall",
+                            "radius": 3, "power": 10, "cost": 1})
+    book = Spellbook()
+    book.add_spell(wall)
+    field = EnergyField(20, 20, "heat")
+    wall.cast(field, 10, 10)
+    assert not book.cast_spell(0, stats, field, 10, 10)
+    assert not Scroll(wall).cast(stats, field, 10, 10)
+    assert stats.current_magic_reserve == 100 and not field.data.any()
+    assert len(first.effect.channels()) == 2
+    assert first.effect.channels()[0] is first.effect.channels()[1], "Channels should share one kernel"
+    try:
+        first.effect.power = 5
+        assert False, "Compiled effects should be immutable"
+    except AttributeError:
+        pass
+    print("✓ Designs compile to shared, immutable effects")
+    
+    # Radial spells match the classic stamp; every energy type gets its channel
+    fields = {t: EnergyField(40, 40, t) for t in ("heat", "cold", "magic")}
+    reference = EnergyField(40, 40, "heat")
+    first.cast(fields, 10.5, 12.5)
+    reference.add_energy(10.5, 12.5, 20, 4)
+    assert np.array_equal(fields["heat"].data, reference.data)
+    assert np.array_equal(fields["magic"].data, reference.data)
+    assert not fields["cold"].data.any()
+    drain = Spell("Siphon", "heat", "drain", 3, 5, 1)
+    drain.cast(fields, 10.5, 12.5)
+    reference.remove_energy(10.5, 12.5, 5, 3)
+    assert np.array_equal(fields["heat"].data, reference.data)
+    print("✓ Casting adds one kernel per energy type")
+    
+    # Lines and cones start at the origin and follow the aim
+    line = Spell("Beam", "cold", "line", 6, 10, 1)
+    line.cast(fields, 20, 20, direction=math.pi / 2)
+    cold = fields["cold"].data
+    assert cold[20, 20] == 10 and cold[25, 20] > 0 and cold[19, 20] == 0
+    assert np.count_nonzero(cold) == 6, "A line should be one cell wide"
+    cone = Spell("Breath", "heat", "cone", 5, 10, 1)
+    field = EnergyField(40, 40, "heat")
+    cone.cast(field, 20, 20, direction=math.pi)
+    assert field.data[20, 16] > 0 and field.data[18, 17] > 0 and not field.data[:, 21:].any()
+    print("✓ Line and cone kernels follow the aim")
+    
+    # Generated designs do not grow the kernel caches without bound
+    for i in range(1500):
+        compile_spell(("heat",), "cone", 1 + i * 0.01, 1.0)
+    assert directional_kernel.cache_info().currsize <= KERNEL_CACHE_SIZE
+    assert compile_spell.cache_info().currsize <= 1024
+    print("✓ Kernel caches are bounded")
+    return True
+
+def test_evocation_engine():
+    """Test batched evocation over many casters"""
+    print("\n=== Testing Evocation Engine ===")
+    import numpy as np
+    from game.core.energy import EnergyField
+    from game.magic.stats import PlayerStats
+    from game.magic.evocation import Evocation, EvocationEngine
+    
+    rng = np.random.default_rng(11)
+    engine = EvocationEngine(initial_capacity=4)
+    shared, single = [], []
+    for i in range(300):
+        pair = []
+        willpower, wisdom = rng.integers(5, 30), rng.integers(0, 60)
+        reserve = rng.uniform(0, 1.5)
+        for owner in (engine, None):
+            stats = PlayerStats()
+            stats.willpower, stats.wisdom = int(willpower), int(wisdom)
+            stats.current_magic_reserve = float(reserve)
+            pair.append(Evocation(stats, owner))
+        shared.append(pair[0])
+        single.append(pair[1])
+    assert engine.size == 300 and shared[5].row == 5
+    assert shared[7].player_stats.pool is engine.pool
+    assert isinstance(shared[7].player_stats.willpower, int), "Pooled ints should read back as ints"
+    assert single[0].engine is None and single[0].player_stats.pool is None, \
+        "Standalone casters should keep their own state"
+    
+    fields = [{t: EnergyField(80, 60, t, tile_size=16) for t in ("heat", "cold")} for _ in range(2)]
+    for i, (a, b) in enumerate(zip(shared, single)):
+        if i % 5 == 0:
+            continue  # Idle casters
+        energy_type = "heat" if i % 2 else "cold"
+        x, y = float(rng.uniform(-3, 83)), float(rng.uniform(-3, 63))
+        for evocation in (a, b):
+            start = evocation.start_push if i % 3 else evocation.start_pull
+            start(energy_type, x, y)
+            if i % 7 == 0:
+                evocation.activate_surge()
+    assert shared[1].is_pushing and shared[3].is_pulling and shared[7].surge_active
+    print("✓ Evocation objects are views of engine rows")
+    
+    for _ in range(4):
+        transfers = engine.update(fields[0], 0.1)
+        expected = [b.update(fields[1][b.energy_type], 0.1) if (b.is_pushing or b.is_pulling) else 0
+                    for b in single]
+        assert np.array_equal(transfers, expected)
+    for t in ("heat", "cold"):
+        assert np.array_equal(fields[0][t].data, fields[1][t].data), "Fields should match per-caster updates"
+        assert np.array_equal(fields[0][t].awake, fields[1][t].awake)
+    reserves = engine.pool.column("current_magic_reserve")
+    assert np.array_equal(reserves, [b.player_stats.current_magic_reserve for b in single])
+    assert [a.is_pushing for a in shared] == [b.is_pushing for b in single]
+    assert any(not a.is_pushing and not a.is_pulling and i % 5 for i, a in enumerate(shared)), \
+        "Some casters should have run out of magic"
+    print("✓ Batched update matches per-caster updates")
+    
+    # World-owned casters are updated by the world
+    from game.world.world import World
+    from game.world.player import Player
+    world = World(width=64, height=64, seed=5)
+    player = Player(32, 32, casters=world.casters)
+    player.start_evocation_push("magic", 20, 20)
+    player.update(world, 0.1)
+    assert world.get_energy_value(20, 20, "magic") == 0
+    world.update(0.1)
+    assert world.get_energy_value(20, 20, "magic") > 0
+    assert player.stats.current_magic_reserve < 100
+    
+    from game.main import Game
+    game = Game()
+    assert game.player.evocation.engine is game.world.casters, "The game's player should be a world caster"
+    print("✓ World update steps its casters")
+    return True
+
+def test_spell_library():
+    """Test indexed spell library files"""
+    print("\n=== Testing Spell Library ===")
+    import os
+    import tempfile
+    import numpy as np
+    from game.magic.spells import Spell, Spellbook, SpellList
+    from game.magic.library import SpellLibrary, is_library
+    
+    book = Spellbook()
+    for i in range(500):
+        types = ["heat", "cold", "magic", "électricité"][i % 4:i % 4 + 1 + i % 2]
+        book.add_spell(Spell(f"Spell {i % 450:03d}", types[0], ("radius", "drain", "cone")[i % 3],
+                             i % 7, i * 0.5, i / 3, types))
+    directory = tempfile.mkdtemp()
+    library_path = os.path.join(directory, "guild.spells")
+    json_path = os.path.join(directory, "guild.json")
+    book.save_to_file(library_path)
+    book.save_to_file(json_path)
+    assert is_library(library_path) and not is_library(json_path)
+    assert os.path.getsize(library_path) < os.path.getsize(json_path)
+    print("✓ Library files are smaller than JSON")
+    
+    loaded = Spellbook()
+    loaded.load_from_file(library_path)
+    assert isinstance(loaded.spells, SpellList) and len(loaded.spells) == 500
+    assert not loaded.spells.library._spells, "Spells should not be built until used"
+    for i in (0, 123, 499):
+        assert loaded.spells[i].to_dict() == book.spells[i].to_dict()
+    assert len(loaded.spells.library._spells) == 3
+    assert loaded.spells[123] is loaded.spells[123], "Paged-in spells should be kept"
+    print("✓ Spells are paged in on demand")
+    
+    # Name index finds the first of duplicate names
+    assert loaded.find_spell("Spell 010") is loaded.spells[10]
+    assert loaded.find_spell("Spell 449").power == book.spells[449].power
+    assert loaded.find_spell("Nope") is None
+    library = SpellLibrary(library_path)
+    rows = [i for i, spell in enumerate(book.spells) if "électricité" in spell.energy_types]
+    assert library.rows_with("électricité").tolist() == rows
+    assert len(library.rows_with("void")) == 0
+    first_rows = {}
+    for i, spell in enumerate(book.spells):
+        first_rows.setdefault(spell.name, i)
+    assert all(library.find(name) == row for name, row in first_rows.items())
+    print("✓ Name and energy type indexes")
+    
+    # An open library keeps reading the file it opened when it is replaced
+    pinned = SpellLibrary(library_path)
+    replacement = Spellbook()
+    replacement.add_spell(Spell("Usurper", "cold", "drain", 1, 1, 1))
+    replacement.save_to_file(library_path)
+    assert len(pinned) == 500 and pinned.find("Usurper") is None
+    assert pinned[10].to_dict() == book.spells[10].to_dict()
+    assert pinned.find("Spell 010") == 10
+    assert SpellLibrary(library_path).find("Usurper") == 0
+    print("✓ Open libraries are pinned to their file")
+    
+    # Editing pages nothing in, and lookups still work
+    removed = loaded.remove_spell(0)
+    loaded.add_spell(Spell("Newcomer", "heat", "radius", 2, 5, 1))
+    assert removed.name == "Spell 000" and len(loaded.spells) == 500
+    assert loaded.find_spell("Spell 010") is loaded.spells[9]
+    assert loaded.find_spell("Newcomer").radius == 2
+    
+    legacy = Spellbook()
+    legacy.load_from_file(json_path)
+    assert [s.to_dict() for s in legacy.spells] == [s.to_dict() for s in book.spells]
+    empty = os.path.join(directory, "empty.spells")
+    Spellbook().save_to_file(empty)
+    reloaded = Spellbook()
+    reloaded.load_from_file(empty)
+    assert len(reloaded.spells) == 0 and reloaded.find_spell("Spell 000") is None
+    print("✓ Editing, legacy JSON and empty libraries")
+    return True
+
+def test_slotted_types():
+    """Test compact value types"""
+    print("\n=== Testing Slotted Types ===")
+    import json
+    from game.core.energy import EnergyNode
+    from game.magic.stats import PlayerStats, StatPool
+    from game.magic.spells import Spell, Scroll
+    from game.magic.evocation import Evocation
+    
+    stats = PlayerStats()
+    objects = [Spell("Fireball", "heat", "radius", 5, 50, 10), Scroll(None), EnergyNode(),
+               stats, Evocation(PlayerStats())]
+    for obj in objects:
+        assert not hasattr(obj, "__dict__"), f"{type(obj).__name__} should not have a __dict__"
+        try:
+            obj.misspelled = 1
+            assert False, "Unknown attributes should be rejected"
+        except AttributeError:
+            pass
+    print("✓ Instances carry no __dict__")
+    
+    # Round-trips through JSON keep every attribute, and share type strings
+    spell = Spell("Steam", "heat", "cone", 4, 20.5, 7.25, ["heat", "magic"])
+    data = json.loads(json.dumps(spell.to_dict()))
+    copy = Spell.from_dict(data)
+    assert copy.to_dict() == spell.to_dict()
+    assert copy.energy_type is spell.energy_type and copy.effect_type is spell.effect_type
+    assert copy.energy_types is spell.energy_types, "Equal type tuples should be shared"
+    
+    # Pooled and unpooled stats behave the same
+    stats.wisdom = 30
+    assert stats.wisdom == 30 and stats.use_magic(10) and stats.current_magic_reserve == 93
+    StatPool().add(stats)
+    assert stats.wisdom == 30 and stats.current_magic_reserve == 93
+    stats.restore_magic(5)
+    assert stats.current_magic_reserve == 98
+    print("✓ Public attributes and round-trips unchanged")
+    return True
+
 def test_magic_systems():
     """Test magic systems"""
     print("\n=== Testing Magic Systems ===")
@@ -120,6 +1044,80 @@ def test_world_system():
     print("✓ Player magic integration working")
     return True
 
+def test_composited_terrain():
+    """Test the incrementally updated composited terrain"""
+    print("\n=== Testing Composited Terrain ===")
+    import numpy as np
+    from game.core.overlay import Overlay
+    from game.world.world import World
+    
+    def brute_force(world):
+        result = world.terrain.data
+        for overlay in world.overlays:
+            if overlay.active:
+                result = (result + overlay.combine_with_field(world.terrain)) / 2
+        return result
+    
+    world = World(80, 60, seed=42)
+    first, second = Overlay(80, 60), Overlay(80, 60, decay_rate=0.2)
+    world.add_overlay(first)
+    world.add_overlay(second)
+    first.apply_effect(20, 20, radius=6, intensity=0.4)
+    assert np.array_equal(world.composited_terrain(), brute_force(world))
+    
+    second.apply_effect(70, 50, radius=15, intensity=-0.3)  # Partly off the map
+    world.terrain.data[5:10, 5:10] = 1.0
+    world.invalidate_terrain(5, 5, 10, 10)
+    assert np.array_equal(world.composited_terrain(), brute_force(world))
+    assert world.get_terrain_value(70, 50) == brute_force(world)[50, 70]
+    print("✓ Overlay stamps and direct writes update the composite")
+    
+    for _ in range(40):
+        world.update(0.1)
+    assert second not in world.overlays
+    assert np.array_equal(world.composited_terrain(), brute_force(world))
+    world.remove_overlay(first)
+    assert np.array_equal(world.composited_terrain(), world.terrain.data)
+    print("✓ Decayed and removed overlays leave the composite")
+    return True
+
+def test_batched_sampling():
+    """Test array-in/array-out sampling"""
+    print("\n=== Testing Batched Sampling ===")
+    import numpy as np
+    from game.core.overlay import Overlay
+    from game.core.chunked_field import ChunkedNoiseField
+    from game.world.world import World
+    
+    world = World(60, 50, seed=42)
+    overlay = Overlay(60, 50)
+    overlay.apply_effect(30, 25, radius=8, intensity=0.4)
+    world.add_overlay(overlay)
+    world.energy_fields["heat"].add_energy(20, 20, 50, radius=5)
+    
+    xs = np.array([0, 12.5, 30.9, 59, -1, 60, 20])
+    ys = np.array([0, 7.2, 25.1, 49, 3, 3, 20])
+    inside = slice(0, 4)
+    assert np.array_equal(world.terrain.sample(xs, ys),
+                          [world.terrain.get_value(x, y) for x, y in zip(xs, ys)])
+    assert np.allclose(world.sample_terrain(xs[inside], ys[inside]),
+                       [world.get_terrain_value(x, y) for x, y in zip(xs[inside], ys[inside])])
+    assert np.allclose(world.sample_energy(xs, ys, "heat"),
+                       [world.get_energy_value(x, y, "heat") for x, y in zip(xs, ys)])
+    assert list(world.sample_biomes(xs[inside], ys[inside])) == [
+        world.get_biome(x, y) for x, y in zip(xs[inside], ys[inside])]
+    print("✓ Nearest sampling matches scalar queries")
+    
+    bilinear = world.terrain.sample([10.5], [20], mode="bilinear")[0]
+    expected = (world.terrain.get_value(10, 20) + world.terrain.get_value(11, 20)) / 2
+    assert np.isclose(bilinear, expected)
+    assert world.terrain.sample([-5], [0], mode="bilinear")[0] == 0.5
+    chunked = ChunkedNoiseField(60, 50, seed=42, scale=0.05, chunk_size=16)
+    assert np.array_equal(chunked.sample(xs, ys, mode="bilinear"),
+                          world.terrain.sample(xs, ys, mode="bilinear"))
+    print("✓ Bilinear sampling working")
+    return True
+
 def test_game_loop():
     """Test that game can be imported and initialized"""
     print("\n=== Testing Game Loop ===")
@@ -141,10 +1139,35 @@ def run_all_tests():
     
     tests = [
         test_noise_generation,
+        test_noise_engines,
+        test_chunked_noise_field,
+        test_parallel_generation,
+        test_field_cache,
         test_overlay_system,
+        test_sparse_overlays,
+        test_stamp_kernels,
+        test_mipmaps,
         test_energy_system,
+        test_energy_diffusion,
+        test_energy_stack,
+        test_sleeping_tiles,
+        test_energy_time_steps,
+        test_energy_network,
+        test_energy_reactions,
+        test_threaded_world_update,
+        test_domain_decomposition,
+        test_lazy_overlay_decay,
+        test_quantized_overlays,
+        test_biome_map,
+        test_cast_queue,
+        test_compiled_spells,
+        test_evocation_engine,
+        test_spell_library,
+        test_slotted_types,
         test_magic_systems,
         test_world_system,
+        test_composited_terrain,
+        test_batched_sampling,
         test_game_loop,
     ]
     